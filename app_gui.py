@@ -4,15 +4,23 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import threading
+import multiprocessing
+import queue
+import bisect
 import json
 import re
-import pandas as pd
-import ezdxf
 
-from src.dxf_analyzer import analyze_dxf_file
-from src.excel_reporter import create_excel_report
+from src.batch_processor import STREAMING_CLEANUP_WARNING, preload_dependencies, run_batch
+from src.piece_cache import DEFAULT_CACHE_DIR, PieceCache
+from src.metrics import format_timings
 
 PROFILES_FILE = 'profiles.json'
+# Intervalo (ms) entre as leituras da fila de progresso da análise
+QUEUE_POLL_MS = 100
+# Espera (ms) após abrir a janela antes de carregar ezdxf/pandas/numpy/openpyxl em segundo plano
+PRELOAD_DELAY_MS = 200
+# Texto da barra de status para as mensagens ('etapa', arquivo, etapa) da análise
+STAGE_LABELS = {'lendo': "Lendo", 'barras': "Calculando as barras de", 'gravando': "Gravando o relatório de"}
 
 class ProfileManagerWindow:
     def __init__(self, root):
@@ -163,6 +171,7 @@ class ProfileManagerWindow:
         save_path = filedialog.asksaveasfilename(title="Salvar Template DXF", defaultextension=".dxf", filetypes=[("Arquivos DXF", "*.dxf")])
         if not save_path: return
         try:
+            import ezdxf
             doc = ezdxf.new()
             for profile_name, types in self.profiles.items():
                 if "DIAGONAL" in types: doc.layers.new(f'DIAGONAL_{profile_name}', dxfattribs={'color': 1})
@@ -180,8 +189,10 @@ class App:
         menubar = tk.Menu(root); root.config(menu=menubar)
         options_menu = tk.Menu(menubar, tearoff=0); menubar.add_cascade(label="Opções", menu=options_menu)
         options_menu.add_command(label="Gerenciar Perfis...", command=self.open_profile_manager)
+        options_menu.add_command(label="Limpar Cache de Análises", command=self.clear_cache)
         self.selected_files = []; self.selected_files_label_text = tk.StringVar(); self.selected_files_label_text.set("Nenhum arquivo selecionado")
         self.status_text = tk.StringVar(); self.status_text.set("Pronto."); self.progress_var = tk.DoubleVar()
+        self.streaming_mode = tk.BooleanVar(value=False); self.use_cache = tk.BooleanVar(value=True); self.optimize_cutting = tk.BooleanVar(value=False); self.cleanup_segments = tk.BooleanVar(value=False)
         main_frame = ttk.Frame(root, padding="10"); main_frame.pack(fill="both", expand=True)
         input_frame = ttk.LabelFrame(main_frame, text="1. Seleção de Arquivos", padding="10"); input_frame.pack(fill="x", pady=5)
         ttk.Button(input_frame, text="Selecionar Arquivo(s) DXF", command=self.select_files).pack(side="left", padx=(0, 10))
@@ -189,6 +200,11 @@ class App:
         action_frame = ttk.Frame(main_frame, padding="10"); action_frame.pack(fill="x")
         self.analyze_button = ttk.Button(action_frame, text="2. Analisar Arquivos e Gerar Relatório", command=self.start_analysis_thread)
         self.analyze_button.pack(pady=10)
+        self.cancel_button = ttk.Button(action_frame, text="Cancelar", command=self.cancel_analysis, state="disabled"); self.cancel_button.pack(pady=(0, 10))
+        ttk.Checkbutton(action_frame, text="Modo streaming (baixo consumo de memória, progresso e cancelamento durante a leitura)", variable=self.streaming_mode).pack()
+        ttk.Checkbutton(action_frame, text="Usar cache de análises", variable=self.use_cache).pack()
+        ttk.Checkbutton(action_frame, text="Otimizar plano de corte (mais lento)", variable=self.optimize_cutting).pack()
+        ttk.Checkbutton(action_frame, text="Remover barras duplicadas e unir segmentos colineares", variable=self.cleanup_segments).pack()
         results_frame = ttk.LabelFrame(main_frame, text="3. Resumo dos Resultados", padding="10"); results_frame.pack(fill="both", expand=True)
         self.tree = ttk.Treeview(results_frame, columns=("Tipo", "Perfil", "Qtd", "Comprimento", "Barras"), show="headings")
         self.tree.heading("Tipo", text="Tipo"); self.tree.column("Tipo", width=120)
@@ -202,35 +218,97 @@ class App:
         ttk.Label(status_frame, textvariable=self.status_text).pack(side="left")
         self.progress_bar = ttk.Progressbar(status_frame, variable=self.progress_var, maximum=100)
         self.progress_bar.pack(side="right", fill="x", expand=True, padx=(10, 0))
+        self.timings_text = tk.Text(main_frame, height=4, state="disabled", font=("TkFixedFont", 8)); self.timings_text.pack(fill="x", padx=10)
+        self.progress_queue = None; self.cancel_event = None
+        self.summary_totals = {}; self.summary_items = {}; self.summary_keys = []
+        self.root.after(PRELOAD_DELAY_MS, self.preload_in_background)
+    def preload_in_background(self):
+        # As dependências pesadas carregam com a janela já na tela; a primeira análise
+        # (que também chama preload_dependencies) só espera se ainda não tiverem terminado
+        threading.Thread(target=preload_dependencies, daemon=True).start()
     def open_profile_manager(self): ProfileManagerWindow(self.root)
+    def clear_cache(self):
+        removed = PieceCache(DEFAULT_CACHE_DIR).clear(); messagebox.showinfo("Cache", f"{removed} entrada(s) removida(s) do cache.")
     def select_files(self):
         files = filedialog.askopenfilenames(title="Selecione", filetypes=[("Arquivos DXF", "*.dxf")])
         if files: self.selected_files = files; count = len(files); self.selected_files_label_text.set(os.path.basename(files[0]) if count == 1 else f"{count} arquivo(s) selecionado(s)"); self.status_text.set(f"{count} arquivo(s) pronto(s) para análise.")
     def start_analysis_thread(self):
         if not self.selected_files: messagebox.showwarning("Aviso", "Selecione um arquivo."); return
-        self.analyze_button.config(state="disabled"); [self.tree.delete(i) for i in self.tree.get_children()]
-        thread = threading.Thread(target=self.run_analysis, daemon=True); thread.start()
-    def run_analysis(self):
+        if self.streaming_mode.get() and self.cleanup_segments.get() and not messagebox.askokcancel("Aviso", f"Streaming com limpeza: {STREAMING_CLEANUP_WARNING}\n\nContinuar?"): return
+        self.analyze_button.config(state="disabled"); self.cancel_button.config(state="normal"); [self.tree.delete(i) for i in self.tree.get_children()]
+        self.timings_text.config(state="normal"); self.timings_text.delete("1.0", tk.END); self.timings_text.config(state="disabled")
+        self.summary_totals = {}; self.summary_items = {}; self.summary_keys = []
+        self.files_done = 0; self.files_total = len(self.selected_files); self.file_fractions = {}; self.files_finished = set()
+        # A análise (thread + processos do pool) só conversa com a interface por esta fila,
+        # lida a cada QUEUE_POLL_MS pelo loop do Tk
+        self.progress_queue = multiprocessing.Queue(); self.cancel_event = multiprocessing.Event()
+        thread = threading.Thread(target=self.run_analysis, args=(self.streaming_mode.get(), self.use_cache.get(), self.optimize_cutting.get(), self.cleanup_segments.get()), daemon=True); thread.start()
+        self.root.after(QUEUE_POLL_MS, self.poll_progress_queue)
+    def cancel_analysis(self):
+        if self.cancel_event is not None: self.cancel_event.set(); self.cancel_button.config(state="disabled"); self.status_text.set("Cancelando...")
+    def run_analysis(self, streaming=False, use_cache=True, optimize=False, cleanup=False):
+        messages = self.progress_queue
         try:
-            all_results = []
-            for i, filepath in enumerate(self.selected_files):
-                filename = os.path.basename(filepath); progress = (i / len(self.selected_files)) * 100
-                self.root.after(0, self.progress_var.set, progress); self.root.after(0, self.status_text.set, f"Processando: {filename} ({i+1}/{len(self.selected_files)})")
-                analysis_data = analyze_dxf_file(filepath)
-                if analysis_data:
-                    summary_df = create_excel_report(analysis_data, filename, "reports")
-                    if summary_df is not None: all_results.append(summary_df)
-            if all_results:
-                final_summary = pd.concat(all_results).groupby(['Tipo', 'Perfil']).sum().reset_index()
-                self.root.after(0, self.populate_results_tree, final_summary)
-        except Exception as e: self.root.after(0, messagebox.showerror, "Erro Durante a Análise", f"Ocorreu um erro inesperado:\n\n{e}")
-        finally: self.root.after(0, self.analysis_complete)
-    def populate_results_tree(self, summary_df):
-        for index, row in summary_df.iterrows(): self.tree.insert("", "end", values=(row["Tipo"], row["Perfil"], row["Quantidade de Peças"], f'{row["Comprimento Total (mm)"]:.2f}', row["Barras de 6m Necessárias"]))
-    def analysis_complete(self):
+            def report_progress(done, total, result): messages.put(('arquivo', done, total, result))
+            messages.put(('status', f"Processando {len(self.selected_files)} arquivo(s)..."))
+            results = run_batch(self.selected_files, "reports", streaming=streaming, progress_callback=report_progress,
+                                progress_queue=messages, cancel_event=self.cancel_event,
+                                cache_dir=DEFAULT_CACHE_DIR if use_cache else None, optimize=optimize, cleanup=cleanup, collect_metrics=True)
+            errors = [f"{r['nome']}: {r['erro']}" for r in results if r['erro'] and not r['cancelado']]
+            if errors: messages.put(('erros', errors))
+        except Exception as e: messages.put(('falha', str(e)))
+        finally: messages.put(('fim', self.cancel_event.is_set()))
+    def poll_progress_queue(self):
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] == 'fim': self.analysis_complete(cancelled=message[1]); return
+                self.handle_progress_message(message)
+        except queue.Empty: pass
+        self.root.after(QUEUE_POLL_MS, self.poll_progress_queue)
+    def handle_progress_message(self, message):
+        kind = message[0]
+        if kind == 'entidades':
+            _, name, done, total = message
+            if name in self.files_finished: return  # mensagem atrasada de um arquivo já concluído
+            if total: self.file_fractions[name] = min(done / total, 1.0)
+            self.status_text.set(f"Lendo {name}: {done}{f'/{total}' if total else ''} entidade(s)...")
+            self.update_progress_bar()
+        elif kind == 'etapa':
+            _, name, stage = message
+            if name in self.files_finished: return
+            self.status_text.set(f"{STAGE_LABELS.get(stage, stage)} {name}...")
+        elif kind == 'arquivo':
+            _, done, total, result = message
+            self.files_done = done; self.files_finished.add(result['nome']); self.file_fractions.pop(result['nome'], None); self.update_progress_bar()
+            self.status_text.set(f"Processado: {result['nome']} ({done}/{total})")
+            if result['resumo'] is not None: self.add_to_results_tree(result['resumo'])
+            if 'metricas' in result and not result['cancelado']: self.append_timings(result['nome'], format_timings(result['metricas']))
+        elif kind == 'status': self.status_text.set(message[1])
+        elif kind == 'erros': messagebox.showwarning("Arquivos com Erro", "\n".join(message[1]))
+        elif kind == 'falha': messagebox.showerror("Erro Durante a Análise", f"Ocorreu um erro inesperado:\n\n{message[1]}")
+    def update_progress_bar(self):
+        self.progress_var.set((self.files_done + sum(self.file_fractions.values())) / self.files_total * 100)
+    def append_timings(self, name, timings):
+        self.timings_text.config(state="normal"); self.timings_text.insert(tk.END, f"{name}: {timings}\n"); self.timings_text.see(tk.END); self.timings_text.config(state="disabled")
+    def add_to_results_tree(self, summary_df):
+        # Soma acumulada por (Tipo, Perfil): só as linhas deste arquivo são atualizadas/inseridas, em ordem
+        columns = ["Tipo", "Perfil", "Quantidade de Peças", "Comprimento Total (mm)", "Barras de 6m Necessárias"]
+        for piece_type, profile, count, length, bars in summary_df[columns].itertuples(index=False):
+            key = (piece_type, profile)
+            totals = self.summary_totals.setdefault(key, [0, 0.0, 0])
+            totals[0] += count; totals[1] += length; totals[2] += bars
+            values = (piece_type, profile, totals[0], f'{totals[1]:.2f}', totals[2])
+            if key in self.summary_items: self.tree.item(self.summary_items[key], values=values)
+            else:
+                position = bisect.bisect(self.summary_keys, key); self.summary_keys.insert(position, key)
+                self.summary_items[key] = self.tree.insert("", position, values=values)
+    def analysis_complete(self, cancelled=False):
+        self.progress_queue = None; self.cancel_event = None
+        self.analyze_button.config(state="normal"); self.cancel_button.config(state="disabled")
+        if cancelled: self.status_text.set("Análise cancelada."); self.progress_var.set(0); return
         self.progress_var.set(100); self.status_text.set("Análise concluída! Relatórios salvos na pasta 'reports'.")
-        self.analyze_button.config(state="normal")
-        if self.status_text.get().startswith("Análise concluída"): messagebox.showinfo("Sucesso", "Processo concluído com sucesso!")
+        messagebox.showinfo("Sucesso", "Processo concluído com sucesso!")
         self.progress_var.set(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+# benchmarks/run_benchmarks.py
+# Uso (na raiz do projeto):
+#   python -m benchmarks.run_benchmarks                      # compara com a baseline
+#   python -m benchmarks.run_benchmarks --save-baseline      # grava uma nova baseline
+#   python -m benchmarks.run_benchmarks --sizes 1000 10000   # só alguns tamanhos
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+
+from benchmarks.truss_generator import generate_for_piece_count
+from src.batch_processor import preload_dependencies
+from src.dxf_analyzer import analyze_dxf_file
+from src.excel_reporter import calculate_stock_cutting, create_excel_report
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_WORK_DIR = os.path.join(BENCHMARK_DIR, '.work')
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Regressão: mais lento/maior que a baseline por esta fração E por este mínimo absoluto
+DEFAULT_TOLERANCE = 0.20
+MIN_TIME_DELTA = 0.05   # s
+MIN_MEMORY_DELTA = 5.0  # MB
+# Peças do DXF da rodada de aquecimento, que não entra nos resultados
+WARM_UP_SIZE = 100
+
+def _stage_analyze(context):
+    context['table'] = analyze_dxf_file(context['dxf_path'])
+
+def _stage_analyze_streaming(context):
+    analyze_dxf_file(context['dxf_path'], streaming=True)
+
+def _stage_nest(context):
+    lengths = context['table'].length_array()
+    for _, _, indices in context['table'].groups():
+        calculate_stock_cutting(lengths[indices].tolist())
+
+def _stage_report(context):
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        create_excel_report(context['table'], 'benchmark.dxf', context['output_folder'])
+
+# (nome, função): cada etapa depende apenas do que 'analyze' deixou no contexto
+STAGES = [
+    ('analyze', _stage_analyze),
+    ('analyze_streaming', _stage_analyze_streaming),
+    ('nest', _stage_nest),
+    ('report', _stage_report),
+]
+
+def _measure(stage, context, with_memory):
+    gc.collect()
+    start = time.perf_counter()
+    stage(context)
+    elapsed = time.perf_counter() - start
+    result = {'tempo_s': round(elapsed, 4)}
+    if with_memory:
+        # Segunda execução só para medir memória: o tracemalloc distorce o tempo
+        gc.collect()
+        tracemalloc.start()
+        stage(context)
+        result['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        tracemalloc.stop()
+    return result
+
+def _dxf_path(work_dir, size):
+    dxf_path = os.path.join(work_dir, f'trelicas_{size}.dxf')
+    if not os.path.exists(dxf_path):
+        print(f"Gerando DXF sintético com {size} peças...")
+        generate_for_piece_count(dxf_path, size)
+    return dxf_path
+
+def _warm_up(work_dir):
+    """
+    Roda todas as etapas uma vez num DXF pequeno, sem medir: as importações
+    adiadas (pandas, openpyxl) e os custos de primeira chamada não caem na
+    primeira etapa medida do primeiro tamanho.
+    """
+    preload_dependencies()
+    with tempfile.TemporaryDirectory() as output_folder:
+        context = {'dxf_path': _dxf_path(work_dir, WARM_UP_SIZE), 'output_folder': output_folder}
+        for _, stage in STAGES:
+            stage(context)
+
+def run(sizes, work_dir, with_memory=True):
+    os.makedirs(work_dir, exist_ok=True)
+    _warm_up(work_dir)
+    results = {}
+    for size in sizes:
+        dxf_path = _dxf_path(work_dir, size)
+        with tempfile.TemporaryDirectory() as output_folder:
+            context = {'dxf_path': dxf_path, 'output_folder': output_folder}
+            size_results = {}
+            for name, stage in STAGES:
+                size_results[name] = _measure(stage, context, with_memory)
+                print(f"  {size:>9} peças | {name:<18} {size_results[name]}")
+            size_results['pecas'] = len(context['table'])
+        results[str(size)] = size_results
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lista de mensagens de regressão em relação à baseline."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            reference = baseline.get('resultados', {}).get(size, {}).get(stage)
+            if not isinstance(metrics, dict) or not reference:
+                continue
+            for metric, minimum in (('tempo_s', MIN_TIME_DELTA), ('memoria_pico_mb', MIN_MEMORY_DELTA)):
+                if metric not in metrics or metric not in reference:
+                    continue
+                delta = metrics[metric] - reference[metric]
+                if delta > minimum and delta > reference[metric] * tolerance:
+                    regressions.append(f"{size} peças / {stage}: {metric} {reference[metric]} -> {metrics[metric]}")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do analisador de treliças")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Números de peças dos DXF sintéticos (padrão: 1k a 1M).")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Arquivo JSON da baseline.")
+    parser.add_argument('--save-baseline', action='store_true', help="Grava os resultados como nova baseline.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Piora relativa aceita antes de acusar regressão (0.2 = 20%%).")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="Pasta dos DXF gerados (reaproveitados).")
+    parser.add_argument('--no-memory', action='store_true', help="Não mede o pico de memória (mais rápido).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args.sizes, args.work_dir, with_memory=not args.no_memory)
+
+    if args.save_baseline:
+        data = {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'resultados': results,
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Nenhuma baseline encontrada; use --save-baseline para criar uma.")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSÕES em relação à baseline:")
+        for message in regressions:
+            print(f"  - {message}")
+        return 1
+    print("\nSem regressões em relação à baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
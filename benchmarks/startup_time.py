@@ -0,0 +1,114 @@
+# benchmarks/startup_time.py
+# Mede o tempo de inicialização (cold start) das entradas do programa.
+# Uso (na raiz do projeto):
+#   python -m benchmarks.startup_time                    # compara com o orçamento padrão
+#   python -m benchmarks.startup_time --budget-ms 300    # outro orçamento
+#   python -m benchmarks.startup_time --top 20           # lista mais módulos lentos
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Orçamento por entrada (ms), medido como o menor tempo entre as execuções
+DEFAULT_BUDGET_MS = 400.0
+DEFAULT_RUNS = 5
+DEFAULT_TOP = 10
+# Não podem ser importados na inicialização: só na primeira análise/relatório
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'ezdxf')
+
+# (nome, argumentos do Python). Cada entrada roda numa pasta temporária com
+# 'data' vazia; a GUI é só importada (sem abrir a janela).
+ENTRY_POINTS = [
+    ('main.py (pasta data vazia)', [os.path.join(PROJECT_DIR, 'main.py')]),
+    ('app_gui (importação)', ['-c', 'import app_gui']),
+]
+
+def parse_importtime(stderr):
+    """
+    Linhas de 'python -X importtime' -> {módulo: tempo acumulado em ms}.
+    Formato: 'import time: self [us] | cumulative | imported package'.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # cabeçalho
+        modules[fields[2].strip()] = int(fields[1]) / 1000.0
+    return modules
+
+def _run_once(arguments, work_dir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', *arguments], cwd=work_dir, env=env,
+                             capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "falhou")
+    return elapsed, parse_importtime(process.stderr)
+
+def measure(arguments, runs=DEFAULT_RUNS):
+    """
+    Roda a entrada runs vezes (a primeira só aquece o cache de bytecode e o
+    do sistema de arquivos). Retorna (menor tempo de parede em ms, módulos
+    importados da execução mais rápida).
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, 'data'))
+        _run_once(arguments, work_dir)
+        best = None
+        for _ in range(max(1, runs)):
+            elapsed, modules = _run_once(arguments, work_dir)
+            if best is None or elapsed < best[0]:
+                best = (elapsed, modules)
+    return best
+
+def check(name, elapsed, modules, budget_ms, top=DEFAULT_TOP):
+    """Imprime o relatório de uma entrada e retorna as violações encontradas."""
+    print(f"\n{name}: {elapsed:.0f} ms (orçamento {budget_ms:.0f} ms)")
+    # Só os módulos de primeiro nível: o tempo acumulado já inclui os submódulos
+    roots = {module: ms for module, ms in modules.items() if '.' not in module or module.startswith('src.')}
+    for module, ms in sorted(roots.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {ms:8.1f} ms  {module}")
+    problems = []
+    if elapsed > budget_ms:
+        problems.append(f"{name}: {elapsed:.0f} ms acima do orçamento de {budget_ms:.0f} ms")
+    loaded = [module for module in HEAVY_MODULES if module in modules]
+    if loaded:
+        problems.append(f"{name}: importa na inicialização {', '.join(loaded)}")
+    return problems
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de inicialização do analisador de treliças")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Tempo máximo de inicialização por entrada, em ms.")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help="Execuções medidas por entrada.")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Quantos módulos mais lentos listar.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    problems = []
+    for name, arguments in ENTRY_POINTS:
+        try:
+            elapsed, modules = measure(arguments, args.runs)
+        except RuntimeError as e:
+            problems.append(f"{name}: {e}")
+            continue
+        problems += check(name, elapsed, modules, args.budget_ms, args.top)
+
+    if problems:
+        print("\nINICIALIZAÇÃO FORA DO ORÇAMENTO:")
+        for message in problems:
+            print(f"  - {message}")
+        return 1
+    print("\nInicialização dentro do orçamento.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
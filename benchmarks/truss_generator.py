@@ -0,0 +1,94 @@
+# benchmarks/truss_generator.py
+# Gera arquivos DXF sintéticos de treliças para medir o desempenho do analisador.
+
+import math
+import random
+
+import ezdxf
+
+DEFAULT_PROFILES = {
+    'BANZO': ['U_100_50_3', 'TUBO_60_3'],
+    'MONTANTE': ['U_50_25_2', 'L_40_3'],
+    'DIAGONAL': ['U_50_25_2', 'L_40_3'],
+}
+NOISE_LAYERS = ('COTAS', 'TEXTOS', 'EIXOS')
+
+def pieces_per_truss(panels):
+    """Banzos superior e inferior por painel + montantes + uma diagonal por painel."""
+    return 2 * panels + (panels + 1) + panels
+
+def generate_truss_dxf(file_path, span=12000.0, height=1500.0, panels=8, trusses=10,
+                       profiles=None, noise_share=0.5, lwpolyline_share=0.3, seed=0):
+    """
+    Grava um DXF com 'trusses' treliças Pratt lado a lado.
+
+    span/height: vão e altura de cada treliça (mm); panels: número de painéis.
+    profiles: {Tipo: [perfis]} usados nas layers TIPO_PERFIL (um perfil
+    sorteado por treliça e tipo).
+    noise_share: fração das entidades que são anotação (textos, círculos,
+    pontos) em layers que não são de treliça.
+    lwpolyline_share: fração das barras desenhadas como LWPOLYLINE em vez de LINE.
+    Retorna o número de peças de treliça gravadas.
+    """
+    rng = random.Random(seed)
+    profiles = profiles or DEFAULT_PROFILES
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for piece_type, names in profiles.items():
+        for name in names:
+            doc.layers.add(f'{piece_type}_{name}')
+    for name in NOISE_LAYERS:
+        doc.layers.add(name)
+
+    def add_member(start, end, layer):
+        if rng.random() < lwpolyline_share:
+            msp.add_lwpolyline([start, end], dxfattribs={'layer': layer})
+        else:
+            msp.add_line(start, end, dxfattribs={'layer': layer})
+
+    panel_width = span / panels
+    noise_per_piece = noise_share / (1.0 - noise_share) if noise_share < 1 else 0
+    noise_debt = 0.0
+    pieces = 0
+    for t in range(trusses):
+        y0 = t * (height * 2)
+        layer = {piece_type: f'{piece_type}_{rng.choice(names)}' for piece_type, names in profiles.items()}
+        members = []
+        for p in range(panels):
+            x0, x1 = p * panel_width, (p + 1) * panel_width
+            members.append(((x0, y0), (x1, y0), layer['BANZO']))
+            members.append(((x0, y0 + height), (x1, y0 + height), layer['BANZO']))
+            # Diagonais sempre descendo em direção ao centro do vão (Pratt)
+            if x0 < span / 2:
+                members.append(((x0, y0 + height), (x1, y0), layer['DIAGONAL']))
+            else:
+                members.append(((x0, y0), (x1, y0 + height), layer['DIAGONAL']))
+        for p in range(panels + 1):
+            x = p * panel_width
+            members.append(((x, y0), (x, y0 + height), layer['MONTANTE']))
+
+        for start, end, member_layer in members:
+            add_member(start, end, member_layer)
+            pieces += 1
+            noise_debt += noise_per_piece
+            while noise_debt >= 1:
+                _add_noise(msp, rng, start)
+                noise_debt -= 1
+    doc.saveas(file_path)
+    return pieces
+
+def _add_noise(msp, rng, near):
+    kind = rng.randrange(3)
+    layer = rng.choice(NOISE_LAYERS)
+    x, y = near[0] + rng.uniform(-200, 200), near[1] + rng.uniform(-200, 200)
+    if kind == 0:
+        msp.add_text(f'{rng.randint(100, 6000)}', dxfattribs={'layer': layer, 'insert': (x, y), 'height': 50})
+    elif kind == 1:
+        msp.add_circle((x, y), radius=25, dxfattribs={'layer': layer})
+    else:
+        msp.add_point((x, y), dxfattribs={'layer': layer})
+
+def generate_for_piece_count(file_path, piece_count, panels=8, **kwargs):
+    """Gera um DXF com pelo menos piece_count peças (ajustando o número de treliças)."""
+    trusses = max(1, math.ceil(piece_count / pieces_per_truss(panels)))
+    return generate_truss_dxf(file_path, panels=panels, trusses=trusses, **kwargs)
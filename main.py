@@ -2,36 +2,129 @@
 # (Este arquivo deve ficar na raiz do projeto, ao lado das pastas src, data, etc.)
 
 import os
-from src.dxf_analyzer import analyze_dxf_file
-from src.excel_reporter import create_excel_report
+import sys
+import json
+import argparse
+from src.batch_processor import STREAMING_CLEANUP_WARNING, run_batch
+from src.piece_cache import DEFAULT_CACHE_DIR, PieceCache
+from src.stock_cutting import DEFAULT_TIME_BUDGET
+from src.excel_reporter import EXPORT_FORMATS
+from src.folder_watcher import FolderWatcher, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME
+from src.analysis_server import AnalysisServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_QUEUE
 
 # Definindo os caminhos com base na estrutura do projeto
 DATA_FOLDER = 'data'
 REPORTS_FOLDER = 'reports'
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analisador de Treliças DXF")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Lê os DXF entidade a entidade (baixo consumo de memória para arquivos grandes).")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Número de processos em paralelo (padrão: número de núcleos).")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="Pasta do cache de peças extraídas.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignora o cache e reanalisa todos os arquivos.")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Apaga o cache de peças antes de iniciar.")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Otimiza o plano de corte das barras de 6m (além do guloso).")
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET,
+                        help="Tempo máximo do otimizador por arquivo, em segundos.")
+    parser.add_argument('--cleanup', action='store_true',
+                        help="Remove barras duplicadas e une segmentos colineares encadeados da mesma layer.")
+    parser.add_argument('--export', choices=EXPORT_FORMATS, default=None,
+                        help="Exporta também a tabela de peças em CSV ou Parquet.")
+    parser.add_argument('--watch', action='store_true',
+                        help="Fica monitorando a pasta 'data' e reprocessa só os arquivos novos ou alterados.")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Intervalo entre varreduras no modo --watch, em segundos.")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_TIME,
+                        help="Tempo sem alterações para um arquivo ser considerado completo (--watch).")
+    parser.add_argument('--metrics', nargs='?', const='-', default=None, metavar='ARQUIVO',
+                        help="Emite uma linha JSON por arquivo com os tempos de cada etapa "
+                             "(na saída padrão ou no ARQUIVO indicado).")
+    parser.add_argument('--profile', default=None, metavar='PASTA',
+                        help="Grava um perfil do cProfile (.prof) por arquivo nesta pasta.")
+    parser.add_argument('--serve', action='store_true',
+                        help="Sobe o servidor HTTP local de análises (API JSON) em vez de processar a pasta 'data'.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Endereço do servidor (--serve).")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Porta do servidor (--serve).")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Requisições aguardando além das em execução antes de responder 503 (--serve).")
+    return parser.parse_args(argv)
+
+def format_stats(stats):
+    if stats.get('cache'):
+        return "(do cache)"
+    if 'ignoradas_tipo' not in stats:
+        return ""
+    blocks = f", {stats['insercoes']} inserção(ões) de bloco" if stats.get('insercoes') else ""
+    if stats.get('duplicadas') or stats.get('fundidas'):
+        blocks += f", {stats.get('duplicadas', 0)} duplicada(s) e {stats.get('fundidas', 0)} segmento(s) unido(s)"
+    return (f"({stats['classificadas']} entidade(s) classificada(s), "
+            f"{stats['ignoradas_tipo'] + stats['ignoradas_layer']} ignorada(s){blocks})")
+
+def main(argv=None):
     """
     Função principal que executa o fluxo de análise dos arquivos DXF.
     """
-    print("Iniciando análise dos arquivos DXF na pasta 'data'...")
-
-    # Lista todos os arquivos na pasta 'data' que terminam com .dxf
-    dxf_files = [f for f in os.listdir(DATA_FOLDER) if f.lower().endswith('.dxf')]
+    args = parse_args(argv)
+    if args.clear_cache:
+        removed = PieceCache(args.cache_dir).clear()
+        print(f"Cache limpo ({removed} entrada(s) removida(s)).")
 
-    if not dxf_files:
-        print("Nenhum arquivo .dxf encontrado na pasta 'data'.")
+    options = dict(streaming=args.streaming, cache_dir=None if args.no_cache else args.cache_dir,
+                   optimize=args.optimize, time_budget=args.time_budget, export_format=args.export,
+                   cleanup=args.cleanup,
+                   collect_metrics=args.metrics is not None, profile_dir=args.profile)
+    if args.streaming and args.cleanup:
+        print(f"Aviso: {STREAMING_CLEANUP_WARNING}")
+    if args.serve:
+        server_options = {key: options[key] for key in ('streaming', 'cache_dir', 'optimize', 'time_budget', 'cleanup')}
+        AnalysisServer(REPORTS_FOLDER, host=args.host, port=args.port, workers=args.workers,
+                       max_queue=args.max_queue, **server_options).serve_forever()
         return
 
-    for dxf_file in dxf_files:
-        print(f"\nProcessando arquivo: {dxf_file}")
-        file_path = os.path.join(DATA_FOLDER, dxf_file)
-        
-        # Analisa o arquivo DXF
-        analysis_result = analyze_dxf_file(file_path)
-        
-        # Se a análise foi bem-sucedida, cria o relatório em Excel
-        if analysis_result:
-            create_excel_report(analysis_result, dxf_file, REPORTS_FOLDER)
+    metrics_output = None
+    if args.metrics and args.metrics != '-':
+        metrics_output = open(args.metrics, 'a', encoding='utf-8')
+
+    def write_metrics(result):
+        if 'metricas' in result:
+            line = json.dumps({'arquivo': result['nome'], **result['metricas']}, ensure_ascii=False)
+            print(line, file=metrics_output or sys.stdout, flush=True)
+
+    def report_progress(done, total, result):
+        if result['erro']:
+            print(f"[{done}/{total}] Falha em {result['nome']}: {result['erro']}")
+        else:
+            print(f"[{done}/{total}] Processado: {result['nome']} {format_stats(result['estatisticas'])}")
+        write_metrics(result)
+
+    try:
+        if args.watch:
+            # O watcher já informa falhas e reprocessamentos; daqui saem só as linhas de métricas
+            FolderWatcher(DATA_FOLDER, REPORTS_FOLDER, interval=args.interval, settle_time=args.settle,
+                          workers=args.workers, progress_callback=lambda done, total, result: write_metrics(result),
+                          **options).run()
+            return
+
+        print("Iniciando análise dos arquivos DXF na pasta 'data'...")
+
+        # Lista todos os arquivos na pasta 'data' que terminam com .dxf
+        dxf_files = sorted(f for f in os.listdir(DATA_FOLDER) if f.lower().endswith('.dxf'))
+
+        if not dxf_files:
+            print("Nenhum arquivo .dxf encontrado na pasta 'data'.")
+            return
+
+        # Analisa os arquivos em paralelo e cria os relatórios em Excel
+        file_paths = [os.path.join(DATA_FOLDER, dxf_file) for dxf_file in dxf_files]
+        run_batch(file_paths, REPORTS_FOLDER, workers=args.workers, progress_callback=report_progress, **options)
+    finally:
+        if metrics_output: metrics_output.close()
 
     print("\nProcesso concluído.")
 
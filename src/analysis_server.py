@@ -0,0 +1,313 @@
+# src/analysis_server.py
+# Uso: python main.py --serve [--port 8765] [--workers N]
+#
+#   GET  /health              -> {"status": "ok", ...}
+#   GET  /metrics             -> contadores e tempos das requisições
+#   POST /analyze             -> corpo JSON {"caminho": "C:/projetos/trelica.dxf", "relatorio": true}
+#   POST /analyze?nome=x.dxf  -> corpo com o próprio DXF (upload), parâmetros na query string
+
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from src.batch_processor import STREAMING_CLEANUP_WARNING, preload_dependencies, process_dxf_file
+from src.excel_reporter import EXPORT_FORMATS, report_path
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Requisições aceitas além das que já estão rodando; acima disso responde 503
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_REQUEST_TIMEOUT = 600.0
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+_UPLOAD_CHUNK = 1024 * 1024
+
+class RequestError(Exception):
+    """Requisição inválida: vira uma resposta JSON com o status HTTP indicado."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _warm_up():
+    # Faz as importações pesadas (ezdxf, pandas, numpy, openpyxl) antes da
+    # primeira requisição; o processo principal não precisa delas.
+    preload_dependencies()
+    return os.getpid()
+
+def _analyze(file_path, display_name, output_folder, options):
+    """Executado no processo do pool: analisa e devolve um resultado serializável em JSON."""
+    result = process_dxf_file(file_path, output_folder, **dict(options, collect_metrics=True))
+    summary = result['resumo']
+    response = {
+        'arquivo': display_name,
+        'erro': result['erro'],
+        'resumo': [],
+        'pecas_total': 0,
+        'barras_total': 0,
+        'relatorio': None,
+        'exportacao': None,
+        'estatisticas': result['estatisticas'],
+        'metricas': result.get('metricas'),
+    }
+    if options.get('streaming') and options.get('cleanup'):
+        response['aviso'] = STREAMING_CLEANUP_WARNING
+    if summary is not None:
+        response['resumo'] = summary.to_dict('records')
+        response['pecas_total'] = int(summary['Quantidade de Peças'].sum())
+        response['barras_total'] = int(summary['Barras de 6m Necessárias'].sum())
+        if options.get('write_report'):
+            response['relatorio'] = os.path.abspath(report_path(display_name, output_folder, timestamped=False,
+                                                                suffix=options.get('report_suffix')))
+            if options.get('export_format'):
+                export_path = os.path.splitext(response['relatorio'])[0] + '.' + options['export_format']
+                if os.path.exists(export_path):  # None se a exportação falhou (ex.: parquet sem pyarrow)
+                    response['exportacao'] = export_path
+    elif not result['erro']:
+        response['erro'] = "Nenhuma peça de treliça encontrada no arquivo."
+    return response
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+class AnalysisServer:
+    """
+    Servidor HTTP local de análises, com um pool de processos já aquecidos.
+
+    Cada requisição ocupa uma vaga enquanto espera ou roda; no máximo
+    workers + max_queue vagas existem ao mesmo tempo e, sem vaga, a resposta
+    é 503 na hora, em vez de acumular requisições sem limite. O pool é
+    recriado se um processo morrer no meio de uma análise.
+    Uma análise que estoura o tempo limite continua ocupando a vaga até o
+    processo realmente terminar (a tarefa em execução não pode ser
+    interrompida), para que o limite valha também para ela.
+    Os relatórios pedidos ("relatorio": true) ficam na pasta reports_folder
+    como Relatorio_<arquivo>_<id da requisição>.xlsx (duas requisições com o
+    mesmo nome não se sobrescrevem), e o caminho vem na resposta.
+    """
+    def __init__(self, reports_folder, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None,
+                 max_queue=DEFAULT_MAX_QUEUE, request_timeout=DEFAULT_REQUEST_TIMEOUT, **options):
+        self.reports_folder = reports_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.request_timeout = request_timeout
+        self.options = options  # padrões de process_dxf_file (cache_dir, optimize, time_budget...)
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self._executor = self._start_pool()
+        self._started = time.time()
+        self._counters = {'recebidas': 0, 'concluidas': 0, 'com_erro': 0, 'rejeitadas': 0,
+                          'em_andamento': 0, 'reinicios_pool': 0}
+        self._busy_seconds = 0.0
+        self.httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.analysis_server = self
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _start_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Sobe todos os processos antes da primeira requisição
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def analyze(self, file_path, display_name, options, upload_dir=None):
+        """
+        Roda uma análise no pool respeitando o limite de vagas; retorna o
+        dicionário de resposta. upload_dir (pasta temporária do arquivo
+        enviado) passa a ser deste método: é apagada só quando a tarefa termina.
+        """
+        self._count('recebidas')
+        if not self._slots.acquire(blocking=False):
+            self._count('rejeitadas')
+            if upload_dir: shutil.rmtree(upload_dir, ignore_errors=True)
+            raise RequestError(503, "Fila de análises cheia; tente novamente em instantes.")
+        self._count('em_andamento')
+        start = time.perf_counter()
+        finish = lambda _future=None: self._finish(start, upload_dir)
+        executor = self._executor
+        try:
+            future = executor.submit(_analyze, file_path, display_name, self.reports_folder, options)
+        except BaseException:
+            finish()
+            raise
+        # Vaga e pasta do upload só são liberadas quando o processo termina, mesmo após um 504
+        future.add_done_callback(finish)
+        try:
+            response = future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()  # só tem efeito se a tarefa ainda não começou
+            raise RequestError(504, f"A análise excedeu {self.request_timeout:g}s.")
+        except BrokenProcessPool:
+            self._restart_pool(executor)
+            raise RequestError(500, "Um processo de análise foi encerrado inesperadamente.")
+        self._count('com_erro' if response['erro'] else 'concluidas')
+        return response
+
+    def _finish(self, start, upload_dir):
+        if upload_dir: shutil.rmtree(upload_dir, ignore_errors=True)
+        with self._lock:
+            self._counters['em_andamento'] -= 1
+            self._busy_seconds += time.perf_counter() - start
+        self._slots.release()
+
+    def _restart_pool(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return  # outra requisição já recriou o pool
+            self._counters['reinicios_pool'] += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start_pool()
+
+    def health(self):
+        with self._lock:
+            return {'status': 'ok', 'workers': self.workers, 'em_andamento': self._counters['em_andamento'],
+                    'uptime_s': round(time.time() - self._started, 1)}
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+            finished = counters['concluidas'] + counters['com_erro']
+            return {
+                'workers': self.workers,
+                'uptime_s': round(time.time() - self._started, 1),
+                'contadores': counters,
+                'tempo_medio_s': round(self._busy_seconds / finished, 4) if finished else None,
+            }
+
+    def request_options(self, params):
+        """Opções de process_dxf_file a partir dos parâmetros da requisição (JSON ou query string)."""
+        options = dict(self.options, write_report=False, timestamped=False)
+        if 'relatorio' in params: options['write_report'] = _flag(params['relatorio'])
+        if 'otimizar' in params: options['optimize'] = _flag(params['otimizar'])
+        if 'streaming' in params: options['streaming'] = _flag(params['streaming'])
+        if 'limpeza' in params: options['cleanup'] = _flag(params['limpeza'])
+        if 'tempo_limite' in params:
+            try:
+                options['time_budget'] = float(params['tempo_limite'])
+            except (TypeError, ValueError):
+                raise RequestError(400, "'tempo_limite' deve ser um número de segundos.")
+        if params.get('exportar'):
+            if params['exportar'] not in EXPORT_FORMATS:
+                raise RequestError(400, f"'exportar' deve ser um de: {', '.join(EXPORT_FORMATS)}.")
+            # A tabela exportada é gravada junto com o relatório
+            options['export_format'] = params['exportar']
+            options['write_report'] = True
+        if options['write_report']:
+            options['report_suffix'] = uuid.uuid4().hex[:12]
+        return options
+
+    def serve_forever(self):
+        print(f"Servidor de análises em {self.address} com {self.workers} processo(s) (Ctrl+C para sair)...")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor encerrado.")
+        finally:
+            self.close()
+
+    def close(self):
+        self.httpd.server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'AnalisadorTrelicas/1.0'
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server.analysis_server
+        route = urlsplit(self.path).path
+        if route == '/health':
+            self._send_json(200, server.health())
+        elif route == '/metrics':
+            self._send_json(200, server.metrics())
+        else:
+            self._send_json(404, {'erro': f"Rota desconhecida: {route}"})
+
+    def do_POST(self):
+        server = self.server.analysis_server
+        url = urlsplit(self.path)
+        if url.path != '/analyze':
+            self._send_json(404, {'erro': f"Rota desconhecida: {url.path}"})
+            return
+        upload_dir = None
+        try:
+            content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+            if content_type == 'application/json':
+                params = self._read_json()
+                file_path = params.get('caminho')
+                if not file_path:
+                    raise RequestError(400, "Informe 'caminho' (DXF local) ou envie o arquivo no corpo.")
+                if not os.path.isfile(file_path):
+                    raise RequestError(404, f"Arquivo não encontrado: {file_path}")
+                display_name = os.path.basename(file_path)
+            else:
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                display_name = os.path.basename(params.get('nome') or 'upload.dxf')
+                if not display_name.lower().endswith('.dxf'):
+                    display_name += '.dxf'
+                upload_dir = tempfile.mkdtemp(prefix='dxf_upload_')
+                file_path = os.path.join(upload_dir, display_name)
+                self._save_upload(file_path)
+            options = server.request_options(params)
+            # Daqui em diante a pasta do upload é apagada por analyze, quando o processo terminar de lê-la
+            owned_dir, upload_dir = upload_dir, None
+            response = server.analyze(file_path, display_name, options, upload_dir=owned_dir)
+            self._send_json(422 if response['erro'] else 200, response)
+        except RequestError as e:
+            self._send_json(e.status, {'erro': str(e)})
+        finally:
+            if upload_dir:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def _content_length(self):
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            raise RequestError(411, "Cabeçalho Content-Length obrigatório.")
+        if length > MAX_UPLOAD_BYTES:
+            raise RequestError(413, f"Arquivo maior que o limite de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+        return length
+
+    def _read_json(self):
+        try:
+            params = json.loads(self.rfile.read(self._content_length()) or b'{}')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise RequestError(400, "Corpo JSON inválido.")
+        if not isinstance(params, dict):
+            raise RequestError(400, "O corpo JSON deve ser um objeto.")
+        return params
+
+    def _save_upload(self, file_path):
+        remaining = self._content_length()
+        if not remaining:
+            raise RequestError(400, "Corpo vazio: envie o DXF ou um JSON com 'caminho'.")
+        with open(file_path, 'wb') as f:
+            while remaining:
+                chunk = self.rfile.read(min(_UPLOAD_CHUNK, remaining))
+                if not chunk:
+                    raise RequestError(400, "Upload interrompido.")
+                f.write(chunk)
+                remaining -= len(chunk)
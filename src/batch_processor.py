@@ -0,0 +1,187 @@
+# src/batch_processor.py
+
+import os
+import cProfile
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.piece_cache import PieceCache, cached_analyze_dxf_file
+from src.excel_reporter import create_excel_report
+from src.metrics import StageMetrics
+from src.stock_cutting import DEFAULT_TIME_BUDGET
+
+# Dependências pesadas do pipeline. Os módulos de src as importam só quando
+# precisam (entradas leves para main.py, GUI e servidor); preload_dependencies
+# carrega todas de uma vez, antes da primeira análise.
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'ezdxf', 'src.dxf_analyzer', 'src.piece_table')
+
+# A limpeza compara as peças retas do arquivo inteiro: guarda as extremidades
+# de todas, então com streaming a memória deixa de ser limitada
+STREAMING_CLEANUP_WARNING = ("a limpeza de segmentos guarda as extremidades de todas as peças retas do arquivo; "
+                             "no modo streaming o consumo de memória passa a crescer com o número de segmentos.")
+
+def preload_dependencies():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+class AnalysisCancelled(Exception):
+    """Lançada dentro da análise quando cancel_event é acionado."""
+
+# Fila de progresso e evento de cancelamento dos processos do pool. Objetos
+# do multiprocessing só podem ser passados na criação do processo, então
+# chegam pelo initializer do pool em vez de pelos argumentos de cada tarefa.
+_worker_progress_queue = None
+_worker_cancel_event = None
+
+def _init_worker(progress_queue, cancel_event):
+    global _worker_progress_queue, _worker_cancel_event
+    _worker_progress_queue, _worker_cancel_event = progress_queue, cancel_event
+
+def _new_result(file_path):
+    return {'arquivo': file_path, 'nome': os.path.basename(file_path), 'resumo': None, 'erro': None,
+            'cancelado': False, 'estatisticas': {}}
+
+def _cancelled_result(file_path):
+    result = _new_result(file_path)
+    result['erro'], result['cancelado'] = "Cancelado", True
+    return result
+
+def process_dxf_file(file_path, output_folder, streaming=False, cache_dir=None,
+                     optimize=False, time_budget=DEFAULT_TIME_BUDGET, export_format=None, timestamped=True,
+                     collect_metrics=False, profile_dir=None, progress_queue=None, cancel_event=None,
+                     write_report=True, cleanup=False, report_suffix=None):
+    """
+    Analisa um único arquivo DXF e gera o seu relatório.
+    Executado dentro dos processos do pool; qualquer erro é capturado e
+    devolvido no resultado para não derrubar o lote inteiro.
+    cache_dir: pasta do cache de peças (None desativa o cache).
+    cleanup: remove duplicadas e une segmentos colineares (ver analyze_dxf_file).
+    optimize/time_budget/export_format/timestamped/write_report/report_suffix: repassados a create_excel_report.
+    collect_metrics: inclui em result['metricas'] os tempos por etapa e os contadores.
+    profile_dir: grava um perfil do cProfile (<arquivo>.prof) nesta pasta.
+    progress_queue: recebe ('entidades', nome, lidas, total) a cada lote de
+    entidades percorridas (total é None no modo streaming) e ('etapa', nome,
+    etapa) ao começar a leitura ('lendo'), as barras de cada grupo ('barras')
+    e a gravação do relatório ('gravando').
+    cancel_event: quando acionado, a análise para no próximo lote ou etapa e
+    o resultado volta com cancelado=True. A leitura do arquivo pelo ezdxf
+    (modo normal) não pode ser interrompida nem informa progresso; para
+    arquivos grandes o modo streaming responde durante toda a leitura.
+    Arquivo ausente, ilegível ou corrompido volta com o motivo em result['erro'].
+    """
+    from src.dxf_analyzer import DXFAnalysisError
+
+    if progress_queue is None: progress_queue = _worker_progress_queue
+    if cancel_event is None: cancel_event = _worker_cancel_event
+    filename = os.path.basename(file_path)
+    result = _new_result(file_path)
+    if cancel_event is not None and cancel_event.is_set():
+        return _cancelled_result(file_path)
+
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            raise AnalysisCancelled(filename)
+
+    def report_progress(done, total):
+        check_cancelled()
+        if progress_queue is not None:
+            progress_queue.put(('entidades', filename, done, total))
+
+    def report_stage(stage):
+        check_cancelled()
+        if progress_queue is not None:
+            progress_queue.put(('etapa', filename, stage))
+
+    metrics = StageMetrics() if collect_metrics else None
+    profiler = cProfile.Profile() if profile_dir else None
+    if profiler: profiler.enable()
+    try:
+        cache = PieceCache(cache_dir) if cache_dir else None
+        track = progress_queue is not None or cancel_event is not None
+        if track: report_stage('lendo')
+        analysis_data = cached_analyze_dxf_file(file_path, streaming=streaming, cache=cache,
+                                                stats=result['estatisticas'], metrics=metrics,
+                                                progress=report_progress if track else None, cleanup=cleanup,
+                                                raise_errors=True)
+        check_cancelled()
+        if analysis_data:
+            result['resumo'] = create_excel_report(analysis_data, filename, output_folder,
+                                                   optimize=optimize, time_budget=time_budget,
+                                                   export_format=export_format, timestamped=timestamped,
+                                                   metrics=metrics, write_report=write_report,
+                                                   report_suffix=report_suffix,
+                                                   progress=report_stage if track else None)
+    except AnalysisCancelled:
+        result['erro'], result['cancelado'] = "Cancelado", True
+    except DXFAnalysisError as e:
+        result['erro'] = str(e)
+    except Exception as e:
+        result['erro'] = f"{type(e).__name__}: {e}"
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, os.path.splitext(filename)[0] + '.prof'))
+    if metrics:
+        result['metricas'] = metrics.as_dict()
+        result['metricas']['contadores'].update(result['estatisticas'])
+    return result
+
+def run_batch(file_paths, output_folder, workers=None, progress_callback=None,
+              progress_queue=None, cancel_event=None, **options):
+    """
+    Processa vários arquivos DXF em paralelo usando um pool de processos.
+
+    workers: número de processos (padrão: número de núcleos da máquina).
+    options: repassadas a process_dxf_file (streaming, cache_dir, optimize,
+    time_budget, export_format, timestamped, collect_metrics, profile_dir,
+    write_report, cleanup, report_suffix).
+    progress_callback(concluidos, total, resultado): chamado a cada arquivo
+    finalizado, na ordem de conclusão.
+    progress_queue/cancel_event: multiprocessing.Queue e multiprocessing.Event
+    (ou equivalentes de threading, com workers=1) para acompanhar a leitura
+    de cada arquivo e cancelar o lote (ver process_dxf_file). Arquivos que
+    nem chegaram a começar também voltam com cancelado=True.
+
+    Retorna a lista de resultados na mesma ordem de file_paths.
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        return []
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+    results = [None] * len(file_paths)
+    # No pai, antes do pool: com fork os processos já nascem com tudo importado
+    preload_dependencies()
+
+    # Um único processo: evita o custo de subir o pool
+    if workers == 1:
+        for i, file_path in enumerate(file_paths):
+            results[i] = process_dxf_file(file_path, output_folder, progress_queue=progress_queue,
+                                          cancel_event=cancel_event, **options)
+            if progress_callback: progress_callback(i + 1, len(file_paths), results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(progress_queue, cancel_event)) as executor:
+        futures = {
+            executor.submit(process_dxf_file, file_path, output_folder, **options): i
+            for i, file_path in enumerate(file_paths)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            if future.cancelled():
+                results[i] = _cancelled_result(file_paths[i])
+            else:
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    # Falha do próprio processo (ex.: pool quebrado), não da análise
+                    results[i] = _new_result(file_paths[i])
+                    results[i]['erro'] = f"{type(e).__name__}: {e}"
+            if cancel_event is not None and cancel_event.is_set():
+                # Tarefas ainda na fila nem chegam a começar
+                for pending in futures:
+                    pending.cancel()
+            if progress_callback: progress_callback(done, len(file_paths), results[i])
+    return results
@@ -1,81 +1,435 @@
 # src/dxf_analyzer.py (versão final corrigida e flexível)
 
 import ezdxf
+from ezdxf import path as ezdxf_path
+from ezdxf.addons import iterdxf
+from ezdxf.math import Matrix44
 import os
-import math
 
-# A função get_length permanece exatamente a mesma.
+import numpy as np
+
+from src.geometry import LengthBatch, straight_segment
+from src.metrics import NULL_METRICS
+from src.piece_table import NO_HANDLE, PieceTable
+from src.segment_cleanup import cleanup_segments
+
+# Incrementar sempre que a extração mudar de resultado (invalida o cache de peças)
+ANALYZER_VERSION = 6
+VALID_TYPES = ("DIAGONAL", "MONTANTE", "BANZO")
+MEASURED_ENTITY_TYPES = ('LINE', 'LWPOLYLINE', 'POLYLINE', 'ARC')
+# Entidades medidas por lote vetorizado (limita a memória no modo streaming)
+BATCH_SIZE = 4096
+# Tolerância (mm) da aproximação por segmentos de arcos em blocos com escala não uniforme
+FLATTENING_TOLERANCE = 0.01
+# Casas decimais da matriz de Gram usada como chave do cache de instâncias de bloco
+_GRAM_DECIMALS = 9
+# Linhas de detalhe da limpeza impressas por arquivo/bloco (o resto só entra na contagem)
+CLEANUP_REPORT_LINES = 20
+
+class DXFAnalysisError(Exception):
+    """Arquivo DXF ausente, ilegível ou corrompido (ver analyze_dxf_file(raise_errors=True))."""
+
 def get_length(entity):
-    if entity.dxftype() == 'LINE':
-        start_point = entity.dxf.start
-        end_point = entity.dxf.end
-        return math.dist(start_point, end_point)
-    elif entity.dxftype() == 'LWPOLYLINE':
-        with entity.points() as points:
-            length = 0.0
-            if len(points) < 2: return 0.0
-            for i in range(len(points) - 1):
-                length += math.dist(points[i], points[i+1])
-            if entity.is_closed:
-                length += math.dist(points[-1], points[0])
-            return length
-    return 0
-
-def analyze_dxf_file(file_path):
+    """Comprimento de uma única entidade (ver LengthBatch para medir em lote)."""
+    batch = LengthBatch()
+    if not batch.add_entity(entity):
+        return 0
+    return float(batch.compute()[0])
+
+def classify_layer(layer_name):
     """
-    Analisa um arquivo DXF e extrai peças.
-    AGORA SUPORTA AMBOS OS FORMATOS DE LAYER:
+    Retorna (Tipo, Perfil) para o nome de layer ou None se a layer não for de treliça.
     1. Novo: 'DIAGONAL_PERFIL_X' -> Tipo='DIAGONAL', Perfil='PERFIL_X'
     2. Antigo: 'DIAGONAL' -> Tipo='DIAGONAL', Perfil='PADRÃO'
     """
-    if not os.path.exists(file_path):
-        print(f"Erro: Arquivo não encontrado em {file_path}")
-        return None
+    layer_name = layer_name.upper()
+    # 1. Tenta o novo formato (TIPO_PERFIL) primeiro
+    if '_' in layer_name:
+        parts = layer_name.split('_', 1)
+        if parts[0] in VALID_TYPES:
+            return parts[0], parts[1]
+    # 2. Se não funcionar, tenta o formato antigo (TIPO)
+    elif layer_name in VALID_TYPES:
+        return layer_name, "PADRÃO"  # Atribui um perfil padrão
+    return None
+
+class LayerClassifier:
+    """
+    Tabela layer -> (Tipo, Perfil) ou None, montada uma vez por documento
+    (a partir da tabela de layers) e completada sob demanda para layers
+    referenciadas por entidades mas não declaradas. Evita refazer
+    upper()/split() para cada entidade.
+    """
+    def __init__(self, layer_names=()):
+        self._table = {name: classify_layer(name) for name in layer_names}
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(layer.dxf.name for layer in doc.layers)
+
+    def __call__(self, layer_name):
+        try:
+            return self._table[layer_name]
+        except KeyError:
+            classification = self._table[layer_name] = classify_layer(layer_name)
+            return classification
 
+def _pieces_from_entities(entities, classifier=None, stats=None, batch_size=BATCH_SIZE, metrics=NULL_METRICS,
+                          progress=None, inserts=None, segments=None):
+    """
+    Gera (Tipo, Perfil, comprimento, handle) por peça a partir de entidades DXF.
+    O tipo da entidade é testado antes de qualquer acesso à layer, de modo que
+    cotas, textos, hachuras etc. são descartados sem custo; a layer passa pela
+    tabela memoizada do LayerClassifier. As entidades classificadas são
+    acumuladas num LengthBatch e medidas em lotes de batch_size.
+    stats (dict/Counter, opcional) recebe as contagens de entidades
+    classificadas e ignoradas; metrics cronometra a medição dos lotes.
+    progress(entidades_lidas), opcional, é chamado a cada batch_size entidades
+    percorridas e no fim; uma exceção lançada por ele interrompe a leitura.
+    inserts (lista, opcional) recebe as entidades INSERT encontradas, que
+    então não contam como ignoradas (ver BlockAnalyzer).
+    segments (lista, opcional) recebe (linha, (Tipo, Perfil), início, fim)
+    das peças que são um único trecho reto, para a limpeza (_cleanup_table);
+    linha é a posição da peça entre as geradas, isto é, a linha da PieceTable
+    (inicialmente vazia) que as recebe. Não depende do handle, que pode faltar
+    (arquivos R12) ou se repetir.
+    """
+    classifier = classifier or LayerClassifier()
+    measured_types = frozenset(MEASURED_ENTITY_TYPES)
+    total = skipped_type = skipped_layer = referenced = rows = 0
+    batch, pending = LengthBatch(), []
     try:
-        doc = ezdxf.readfile(file_path)
-        msp = doc.modelspace()
-        
-        extracted_pieces = []
-        valid_types = ("DIAGONAL", "MONTANTE", "BANZO")
-
-        for entity in msp:
-            if entity.dxf.hasattr('layer'):
-                layer_name = entity.dxf.layer.upper()
-                
-                piece_type = None
-                piece_profile = None
-
-                # --- LÓGICA DE CORREÇÃO ---
-                # 1. Tenta o novo formato (TIPO_PERFIL) primeiro
-                if '_' in layer_name:
-                    parts = layer_name.split('_', 1)
-                    if parts[0] in valid_types:
-                        piece_type = parts[0]
-                        piece_profile = parts[1]
-                # 2. Se não funcionar, tenta o formato antigo (TIPO)
+        for entity in entities:
+            total += 1
+            if progress and total % batch_size == 0:
+                progress(total)
+            dxftype = entity.dxftype()
+            if dxftype not in measured_types:
+                if dxftype == 'INSERT' and inserts is not None:
+                    inserts.append(entity)
+                    referenced += 1
                 else:
-                    if layer_name in valid_types:
-                        piece_type = layer_name
-                        piece_profile = "PADRÃO" # Atribui um perfil padrão
-                # --- FIM DA LÓGICA DE CORREÇÃO ---
-
-                # Se um tipo válido foi encontrado (por qualquer um dos métodos)
-                if piece_type:
-                    if entity.dxftype() in ('LINE', 'LWPOLYLINE'):
-                        length = get_length(entity)
-                        if length > 0:
-                            extracted_pieces.append({
-                                'Tipo': piece_type,
-                                'Perfil': piece_profile,
-                                'Comprimento (mm)': length
-                            })
-        
-        return extracted_pieces
+                    skipped_type += 1
+                continue
+            classification = classifier(entity.dxf.get('layer', '0'))
+            # Se um tipo válido foi encontrado (por qualquer um dos métodos)
+            if not classification:
+                skipped_layer += 1
+                continue
+            if not batch.add_entity(entity):
+                skipped_type += 1  # ex.: POLYLINE de malha
+                continue
+            segment = straight_segment(entity) if segments is not None else None
+            pending.append((*classification, entity.dxf.handle, segment))
+            if len(pending) >= batch_size:
+                rows += yield from _measured_pieces(batch, pending, metrics, segments, rows)
+                batch, pending = LengthBatch(), []
+        if pending:
+            rows += yield from _measured_pieces(batch, pending, metrics, segments, rows)
+        if progress:
+            progress(total)
+    finally:
+        if stats is not None:
+            for key, value in (('entidades', total),
+                               ('classificadas', total - skipped_type - skipped_layer - referenced),
+                               ('ignoradas_tipo', skipped_type), ('ignoradas_layer', skipped_layer)):
+                stats[key] = stats.get(key, 0) + value
 
-    except IOError:
-        print(f"Erro: Não foi possível ler o arquivo {file_path}.")
+def _measured_pieces(batch, pending, metrics=NULL_METRICS, segments=None, first_row=0):
+    """Mede o lote e gera as peças de comprimento positivo; retorna quantas gerou."""
+    with metrics.stage('measure'):
+        lengths = batch.compute().tolist()
+    row = first_row
+    for (piece_type, piece_profile, handle, segment), length in zip(pending, lengths):
+        if length > 0:
+            if segment:
+                segments.append((row, (piece_type, piece_profile), *segment))
+            row += 1
+            yield piece_type, piece_profile, length, handle
+    return row - first_row
+
+def _cleanup_table(table, segments, source, stats=None, runs=None):
+    """
+    Aplica cleanup_segments às peças retas da tabela: remove duplicadas e
+    une trechos colineares encadeados da mesma classificação (Tipo, Perfil).
+    Imprime o que foi unido (até CLEANUP_REPORT_LINES linhas) e soma
+    'duplicadas' e 'fundidas' em stats. Retorna a nova tabela.
+    runs (dict, opcional) recebe linha da nova tabela -> vetor (3,) do trecho
+    unido de cada peça mantida numa fusão, para remedir o trecho inteiro
+    (BlockAnalyzer).
+    """
+    if len(segments) < 2:
+        return table
+    row_indices = np.array([row for row, _, _, _ in segments], dtype=np.int64)
+    group_codes = {}
+    groups = [group_codes.setdefault(group, len(group_codes)) for _, group, _, _ in segments]
+    lengths = table.length_array()
+    result = cleanup_segments(groups, [start for _, _, start, _ in segments], [end for _, _, _, end in segments],
+                              lengths[row_indices])
+    if not result.duplicates and not result.merges:
+        return table
+
+    def describe(index):
+        row = row_indices[index]
+        handle = table.handles[row]
+        return f"#{handle:X}" if handle != NO_HANDLE else f"linha {row + 1}"
+
+    lines = [f"  duplicada: {describe(removed)} = {describe(kept)} "
+             f"({' '.join(segments[kept][1])})" for kept, removed in result.duplicates]
+    lines += [f"  unidos: {describe(kept)} + {', '.join(describe(index) for index in absorbed)} -> "
+              f"{length:.2f} mm ({' '.join(segments[kept][1])})" for kept, absorbed, length in result.merges]
+    print(f"Limpeza em {source}: {len(result.duplicates)} duplicada(s) removida(s), "
+          f"{result.merged_count} segmento(s) unido(s) a {len(result.merges)} peça(s).")
+    for line in lines[:CLEANUP_REPORT_LINES]:
+        print(line)
+    if len(lines) > CLEANUP_REPORT_LINES:
+        print(f"  ... e mais {len(lines) - CLEANUP_REPORT_LINES}.")
+    if stats is not None:
+        stats['duplicadas'] = stats.get('duplicadas', 0) + len(result.duplicates)
+        stats['fundidas'] = stats.get('fundidas', 0) + result.merged_count
+
+    new_lengths = lengths.copy()
+    new_lengths[row_indices] = result.lengths
+    keep = np.ones(len(table), dtype=bool)
+    keep[row_indices[~result.keep]] = False
+    if runs is not None:
+        new_rows = np.cumsum(keep) - 1
+        for kept, _, length in result.merges:
+            direction = np.subtract(segments[kept][3], segments[kept][2])
+            runs[int(new_rows[row_indices[kept]])] = direction / np.linalg.norm(direction) * length
+    return table.with_lengths(new_lengths).take(np.flatnonzero(keep))
+
+def _linear_part(insert):
+    """Parte linear (3x3, vetores-linha como no ezdxf) da transformação de um INSERT."""
+    matrix = insert.matrix44()
+    return np.array([matrix.ux, matrix.uy, matrix.uz], dtype=np.float64)
+
+def _gram_key(gram):
+    """Chave hashable da matriz de Gram, com precisão relativa (escala 0.001 não vira zero)."""
+    return tuple(float(f'{value:.{_GRAM_DECIMALS + 3}g}') for value in gram.ravel())
+
+def _similarity_scale(gram):
+    """Fator de escala se a transformação for uma semelhança (escala uniforme), senão None."""
+    scale_squared = gram[0, 0]
+    tolerance = 1e-9 * max(scale_squared, 1e-300)
+    if np.all(np.abs(gram - scale_squared * np.eye(3)) <= tolerance):
+        return float(np.sqrt(scale_squared))
+    return None
+
+def _path_length(entity, matrix):
+    """Comprimento de uma entidade após a transformação matrix (arcos aproximados por segmentos)."""
+    entity_path = ezdxf_path.make_path(entity).transform(matrix)
+    points = np.array([vertex.xyz for vertex in entity_path.flattening(FLATTENING_TOLERANCE)], dtype=np.float64)
+    if len(points) < 2:
+        return 0.0
+    return float(np.sqrt((np.diff(points, axis=0) ** 2).sum(axis=1)).sum())
+
+class BlockAnalyzer:
+    """
+    Peças das referências a blocos (INSERT e MINSERT) sem explodir as instâncias.
+
+    Cada definição de bloco é percorrida uma única vez por layer herdada
+    (entidades na layer '0' assumem a layer do INSERT que as referencia, como
+    no AutoCAD) e a tabela de peças resultante serve para todas as instâncias:
+    com escala uniforme (com qualquer rotação ou espelhamento) basta
+    multiplicar os comprimentos pelo fator; com escala não uniforme as
+    entidades do bloco são remedidas pela transformação acumulada. Blocos
+    aninhados e arranjos de MINSERT entram como multiplicidades (repeat).
+
+    Os comprimentos de uma instância dependem apenas da matriz de Gram
+    (A·Aᵀ) da parte linear acumulada, então as instâncias são memoizadas por
+    (bloco, layer herdada, Gram): um projeto com 30 cópias de uma treliça
+    custa praticamente o mesmo que uma.
+    Com cleanup=True cada definição passa pela limpeza (_cleanup_table) uma
+    vez; duplicatas entre instâncias diferentes não são procuradas. Nas
+    instâncias remedidas, a peça que absorveu uma fusão é medida pelo vetor
+    do trecho unido, não pela entidade original.
+    """
+    def __init__(self, doc, classifier=None, metrics=NULL_METRICS, cleanup=False, stats=None):
+        self.doc = doc
+        self.classifier = classifier or LayerClassifier()
+        self.metrics = metrics
+        self.cleanup = cleanup
+        self.stats = stats
+        self._definitions = {}  # (bloco, layer herdada) -> (PieceTable, INSERTs internos, trechos unidos)
+        self._instances = {}    # (bloco, layer herdada, Gram) -> PieceTable
+        self._active = set()    # blocos sendo expandidos (detecta referência circular)
+        self.insert_count = 0
+
+    @property
+    def definition_count(self):
+        return len(self._definitions)
+
+    def add_inserts(self, inserts, table):
+        """Acrescenta a table as peças dos INSERTs do modelspace."""
+        self.insert_count += sum(insert.mcount for insert in inserts)
+        self._add_references(table, inserts, '0', np.eye(3))
+
+    def _add_references(self, table, inserts, inherited_layer, gram):
+        groups = {}
+        for insert in inserts:
+            linear = _linear_part(insert)
+            child_gram = linear @ gram @ linear.T
+            layer = insert.dxf.get('layer', '0')
+            key = (insert.dxf.name, inherited_layer if layer == '0' else layer, _gram_key(child_gram))
+            if key in groups:
+                groups[key][1] += insert.mcount
+            else:
+                groups[key] = [child_gram, insert.mcount]
+        for (name, layer, gram_key), (child_gram, count) in groups.items():
+            table.extend(self._instance(name, layer, child_gram, gram_key), repeat=count)
+
+    def _instance(self, name, inherited_layer, gram, gram_key):
+        key = (name, inherited_layer, gram_key)
+        table = self._instances.get(key)
+        if table is not None:
+            return table
+        if name in self._active:
+            print(f"Aviso: referência circular ao bloco '{name}' ignorada.")
+            return PieceTable()
+        self._active.add(name)
+        try:
+            base, children, runs = self._definition(name, inherited_layer)
+            scale = _similarity_scale(gram)
+            if scale is None:
+                table = self._remeasured(base, gram, runs)
+            else:
+                table = base if scale == 1.0 else base.scaled(scale)
+            if children:
+                own_pieces, table = table, PieceTable()
+                table.extend(own_pieces)
+                self._add_references(table, children, inherited_layer, gram)
+        finally:
+            self._active.discard(name)
+        self._instances[key] = table
+        return table
+
+    def _definition(self, name, inherited_layer):
+        key = (name, inherited_layer)
+        definition = self._definitions.get(key)
+        if definition is None:
+            block = self.doc.blocks.get(name)
+            table, children, runs = PieceTable(), [], {}
+            if block is None:
+                print(f"Aviso: definição do bloco '{name}' não encontrada.")
+            else:
+                classify = lambda layer: self.classifier(inherited_layer if layer == '0' else layer)
+                segments = [] if self.cleanup else None
+                for piece in _pieces_from_entities(block, classify, metrics=self.metrics, inserts=children,
+                                                   segments=segments):
+                    table.append(*piece)
+                if segments:
+                    with self.metrics.stage('cleanup'):
+                        table = _cleanup_table(table, segments, f"bloco '{name}'", self.stats, runs)
+            definition = self._definitions[key] = (table, children, runs)
+        return definition
+
+    def _remeasured(self, base, gram, runs):
+        # Qualquer A com A·Aᵀ = Gram dá os mesmos comprimentos: usa a decomposição espectral
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        affine = np.eye(4)
+        affine[:3, :3] = eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+        matrix = Matrix44(affine.ravel().tolist())
+        with self.metrics.stage('measure'):
+            # Trecho unido pela limpeza: |v·A| = sqrt(v·Gram·vᵀ)
+            lengths = [float(np.sqrt(runs[row] @ gram @ runs[row])) if row in runs
+                       else _path_length(self.doc.entitydb[f'{handle:X}'], matrix)
+                       for row, handle in enumerate(base.handles)]
+        return base.with_lengths(lengths)
+
+def iter_dxf_pieces(file_path, stats=None, metrics=NULL_METRICS, progress=None, segments=None):
+    """
+    Modo streaming: percorre o modelspace direto do arquivo, sem carregar o
+    documento inteiro. Apenas entidades dos tipos medidos são materializadas,
+    em lotes de BATCH_SIZE, então o consumo de memória não depende do tamanho
+    do arquivo.
+    Gera as peças, como (Tipo, Perfil, comprimento, handle), à medida que
+    são encontradas. Aqui o filtro por tipo acontece ainda nas tags do arquivo,
+    então as entidades de outros tipos nem entram nas contagens de stats.
+    Sem o documento carregado não há definições de blocos: os INSERTs são
+    apenas contados (stats['insercoes_ignoradas']) e avisados.
+    """
+    entities = iterdxf.modelspace(file_path, types=MEASURED_ENTITY_TYPES + ('INSERT',))
+    inserts = []
+    yield from _pieces_from_entities(entities, stats=stats, metrics=metrics, progress=progress, inserts=inserts,
+                                     segments=segments)
+    if inserts:
+        # O iterdxf não dá acesso à seção BLOCKS
+        print(f"Aviso: {len(inserts)} inserção(ões) de bloco ignorada(s) no modo streaming; "
+              f"use o modo normal para contar as peças dos blocos.")
+        if stats is not None: stats['insercoes_ignoradas'] = stats.get('insercoes_ignoradas', 0) + len(inserts)
+
+def analyze_dxf_file(file_path, streaming=False, stats=None, metrics=None, progress=None, cleanup=False,
+                     raise_errors=False):
+    """
+    Analisa um arquivo DXF e extrai peças.
+    AGORA SUPORTA AMBOS OS FORMATOS DE LAYER (ver classify_layer).
+    Com streaming=True o arquivo é lido entidade a entidade (iter_dxf_pieces)
+    em vez de ser carregado inteiro com ezdxf.readfile.
+    Fora do modo streaming, as referências a blocos (INSERT/MINSERT, inclusive
+    aninhadas) também são contadas, via BlockAnalyzer.
+    Retorna uma PieceTable (tabela colunar de peças) ou None em caso de erro.
+    stats (dict/Counter, opcional) recebe as contagens de entidades
+    classificadas e ignoradas (por tipo e por layer) e de inserções e
+    definições de blocos ('insercoes', 'blocos').
+    metrics (StageMetrics, opcional) recebe os tempos das etapas read,
+    classify, iterate e measure (no modo streaming a leitura do arquivo
+    acontece junto com a iteração e entra em 'iterate').
+    progress(entidades_lidas, total), opcional, acompanha a leitura do
+    modelspace; total é None no modo streaming (não se sabe de antemão).
+    cleanup=True remove peças retas duplicadas e une trechos colineares
+    encadeados da mesma layer (ver src.segment_cleanup), etapa 'cleanup'.
+    A limpeza guarda as extremidades de todas as peças retas do arquivo: com
+    streaming=True a memória volta a crescer com o número de segmentos.
+    raise_errors=True lança DXFAnalysisError com o motivo da falha em vez de
+    imprimi-lo e retornar None (usado pelo processamento em lote).
+    """
+    metrics = metrics or NULL_METRICS
+
+    def fail(message):
+        if raise_errors:
+            raise DXFAnalysisError(message)
+        print(f"Erro: {message}")
         return None
+
+    if not os.path.exists(file_path):
+        return fail(f"Arquivo não encontrado em {file_path}")
+
+    try:
+        segments = [] if cleanup else None
+        if streaming:
+            entity_progress = progress and (lambda done: progress(done, None))
+            pieces = iter_dxf_pieces(file_path, stats=stats, metrics=metrics, progress=entity_progress,
+                                     segments=segments)
+        else:
+            with metrics.stage('read'):
+                doc = ezdxf.readfile(file_path)
+            with metrics.stage('classify'):
+                classifier = LayerClassifier.from_document(doc)
+            msp = doc.modelspace()
+            entity_progress = progress and (lambda done, expected=len(msp): progress(done, expected))
+            inserts = []
+            pieces = _pieces_from_entities(msp, classifier, stats, metrics=metrics, progress=entity_progress,
+                                           inserts=inserts, segments=segments)
+
+        table = PieceTable()
+        with metrics.stage('iterate'):
+            for piece in pieces:
+                table.append(*piece)
+        if segments:
+            with metrics.stage('cleanup'):
+                table = _cleanup_table(table, segments, os.path.basename(file_path), stats)
+        with metrics.stage('iterate'):
+            if not streaming and inserts:
+                blocks = BlockAnalyzer(doc, classifier, metrics, cleanup=cleanup, stats=stats)
+                blocks.add_inserts(inserts, table)
+                if stats is not None:
+                    stats['insercoes'] = stats.get('insercoes', 0) + blocks.insert_count
+                    stats['blocos'] = stats.get('blocos', 0) + blocks.definition_count
+        metrics.count('pecas', len(table))
+        return table
+
+    except IOError:
+        return fail(f"Não foi possível ler o arquivo {file_path}.")
     except ezdxf.DXFStructureError:
-        print(f"Erro: Arquivo DXF inválido ou corrompido: {file_path}.")
-        return None
\ No newline at end of file
+        return fail(f"Arquivo DXF inválido ou corrompido: {file_path}.")
@@ -1,84 +1,195 @@
 # src/excel_reporter.py
 
-import pandas as pd
 import os
+import csv
+import math
+import time
 from datetime import datetime
 
-# A função calculate_stock_cutting permanece exatamente a mesma.
-def calculate_stock_cutting(lengths, stock_length=6000, kerf=4):
-    # (nenhuma alteração aqui)
+# pandas, numpy e openpyxl são importados dentro das funções: quem só precisa
+# das constantes e de report_path (main.py, GUI, servidor) não paga a importação
+from src.metrics import NULL_METRICS
+from src.stock_cutting import (DEFAULT_STOCK_LENGTH, DEFAULT_KERF, DEFAULT_TIME_BUDGET,
+                               nest_stock_cutting, optimize_stock_cutting)
+
+DETAIL_COLUMNS = ['Índice', 'Peça', 'Comprimento (mm)', 'Tipo', 'Perfil', 'Arquivo DXF']
+EXPORT_FORMATS = ('csv', 'parquet')
+
+def calculate_stock_cutting(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF):
+    """
+    Quantidade de barras necessárias para cortar as peças (mesmo resultado do
+    guloso original). O plano de corte completo está em nest_stock_cutting.
+    """
     if not lengths: return 0
-    pieces_to_cut = sorted(lengths, reverse=True)
-    bar_count = 1
-    current_bar_length = stock_length
-    while pieces_to_cut:
-        piece_cut_in_this_bar = False
-        for i, piece_length in enumerate(pieces_to_cut):
-            space_needed = piece_length
-            if current_bar_length < stock_length: space_needed += kerf
-            if current_bar_length >= space_needed:
-                if current_bar_length < stock_length: current_bar_length -= kerf
-                current_bar_length -= piece_length
-                pieces_to_cut.pop(i)
-                piece_cut_in_this_bar = True
-                break
-        if not piece_cut_in_this_bar and pieces_to_cut:
-            bar_count += 1
-            current_bar_length = stock_length
-    return bar_count
-
-def create_excel_report(pieces_data, dxf_filename, output_folder):
+    return nest_stock_cutting(lengths, stock_length, kerf).bar_count
+
+def report_path(dxf_filename, output_folder, timestamped=True, suffix=None):
+    """
+    Caminho do relatório de um DXF. Com timestamped=False o nome é fixo
+    (Relatorio_<arquivo>.xlsx), para reprocessamentos sobrescreverem o mesmo arquivo.
+    suffix (opcional) entra no nome (Relatorio_<arquivo>_<suffix>...), ex. um
+    identificador por requisição no servidor.
+    """
+    base_filename = os.path.splitext(dxf_filename)[0]
+    if suffix:
+        base_filename = f"{base_filename}_{suffix}"
+    if timestamped:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(output_folder, f"Relatorio_{base_filename}_{timestamp}.xlsx")
+    return os.path.join(output_folder, f"Relatorio_{base_filename}.xlsx")
+
+def create_excel_report(pieces_data, dxf_filename, output_folder, optimize=False, time_budget=DEFAULT_TIME_BUDGET,
+                        export_format=None, timestamped=True, metrics=None, write_report=True, report_suffix=None,
+                        progress=None):
     """
     Cria um relatório em Excel agrupando por TIPO e PERFIL.
+    Com optimize=True as barras de cada grupo vêm do otimizador
+    (optimize_stock_cutting), que divide time_budget (segundos) entre os
+    grupos, e o resumo ganha as colunas de limite inferior e gap.
+    O .xlsx é gravado em modo streaming (write_streaming_workbook), com as
+    linhas do detalhamento geradas direto da PieceTable. export_format
+    ('csv' ou 'parquet') grava também a tabela de peças ao lado do relatório.
+    timestamped/report_suffix: ver report_path.
+    metrics (StageMetrics, opcional) recebe os tempos das etapas aggregate,
+    nest e write.
+    write_report=False só calcula e retorna o resumo, sem gravar arquivos.
+    progress(etapa), opcional, é chamado antes das barras de cada grupo
+    ('barras') e antes da gravação ('gravando'); uma exceção lançada por ele
+    interrompe o relatório (cancelamento).
     """
-    if not os.path.exists(output_folder):
+    import numpy as np
+    import pandas as pd
+    from src.piece_table import PieceTable
+
+    metrics = metrics or NULL_METRICS
+    if write_report and not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
     if not pieces_data:
         print(f"Nenhum dado encontrado para o arquivo {dxf_filename}.")
         return None
 
-    # --- MUDANÇA: Cria o DataFrame diretamente da lista de peças ---
-    df = pd.DataFrame(pieces_data)
-    df['Arquivo DXF'] = dxf_filename
-    
-    # Adiciona colunas de Índice e Peça, reiniciando a contagem para cada grupo
-    df['Índice'] = df.groupby(['Tipo', 'Perfil']).cumcount() + 1
-    df['Peça'] = df['Tipo'] + '_' + df['Perfil'] + '_' + df['Índice'].astype(str)
-    
-    # Reordena as colunas para o relatório detalhado
-    detalhamento_df = df[['Índice', 'Peça', 'Comprimento (mm)', 'Tipo', 'Perfil', 'Arquivo DXF']]
-
-    # --- MUDANÇA: Agrupa por Tipo E Perfil para o resumo ---
-    summary_df = df.groupby(['Tipo', 'Perfil']).agg(
-        Quantidade_de_Peças=('Comprimento (mm)', 'count'),
-        Comprimento_Total_mm=('Comprimento (mm)', 'sum')
-    ).reset_index()
-
-    # Aplica o cálculo de corte para cada grupo
-    summary_df['Barras de 6m Necessárias'] = summary_df.apply(
-        lambda row: calculate_stock_cutting(
-            df[(df['Tipo'] == row['Tipo']) & (df['Perfil'] == row['Perfil'])]['Comprimento (mm)'].tolist()
-        ),
-        axis=1
-    )
-    
-    # Renomeia colunas para um visual melhor
-    summary_df.rename(columns={
-        'Quantidade_de_Peças': 'Quantidade de Peças',
-        'Comprimento_Total_mm': 'Comprimento Total (mm)'
-    }, inplace=True)
-    
+    # Aceita também a antiga lista de dicionários por peça
+    if not isinstance(pieces_data, PieceTable):
+        pieces_data = PieceTable.from_records(pieces_data)
+    lengths = pieces_data.length_array()
+
+    # --- Uma única passada pelos grupos (Tipo, Perfil): índice das peças, resumo e corte ---
+    with metrics.stage('aggregate'):
+        piece_index = np.empty(len(pieces_data), dtype=np.int64)
+        groups = pieces_data.groups()
+        summary_rows = []
+        deadline = time.perf_counter() + time_budget
+        for i, (piece_type, piece_profile, indices) in enumerate(groups):
+            # Índice reiniciando a contagem para cada grupo
+            piece_index[indices] = np.arange(1, len(indices) + 1)
+            group_lengths = lengths[indices].tolist()
+            row = {
+                'Tipo': piece_type,
+                'Perfil': piece_profile,
+                'Quantidade de Peças': len(indices),
+                'Comprimento Total (mm)': math.fsum(group_lengths),
+            }
+            if progress: progress('barras')
+            with metrics.stage('nest'):
+                if optimize:
+                    # O tempo que um grupo não usa fica para os seguintes
+                    group_budget = max(0.0, deadline - time.perf_counter()) / (len(groups) - i)
+                    plan = optimize_stock_cutting(group_lengths, time_budget=group_budget)
+                    row['Barras de 6m Necessárias'] = plan.bar_count
+                    row['Limite Inferior (barras)'] = plan.lower_bound
+                    row['Gap (barras)'] = plan.gap
+                else:
+                    row['Barras de 6m Necessárias'] = calculate_stock_cutting(group_lengths)
+            summary_rows.append(row)
+        summary_df = pd.DataFrame(summary_rows)
+    metrics.count('grupos', len(groups))
+    metrics.count('barras', int(summary_df['Barras de 6m Necessárias'].sum()))
+    if not write_report:
+        return summary_df
+
     # Salva o arquivo Excel
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = os.path.splitext(dxf_filename)[0]
-    output_filename = f"Relatorio_{base_filename}_{timestamp}.xlsx"
-    output_path = os.path.join(output_folder, output_filename)
+    if progress: progress('gravando')
+    output_path = report_path(dxf_filename, output_folder, timestamped, report_suffix)
+    with metrics.stage('write'):
+        write_streaming_workbook(output_path, [
+            ('Detalhamento das Peças', DETAIL_COLUMNS, _detail_rows(pieces_data, piece_index, dxf_filename)),
+            ('Resumo por Perfil', list(summary_df.columns), summary_df.itertuples(index=False, name=None)),
+        ])
+        print(f"Relatório salvo com sucesso em: {output_path}")
+
+        if export_format:
+            export_path = os.path.splitext(output_path)[0] + '.' + export_format
+            if export_detail_table(export_path, export_format, pieces_data, piece_index, dxf_filename):
+                print(f"Tabela de peças exportada em: {export_path}")
+
+    return summary_df
+
+def _detail_rows(pieces_data, piece_index, dxf_filename):
+    """Linhas do detalhamento geradas direto das colunas da PieceTable."""
+    types, profiles = pieces_data.types, pieces_data.profiles
+    for type_code, profile_code, index, length in zip(pieces_data.type_codes, pieces_data.profile_codes,
+                                                      piece_index.tolist(), pieces_data.lengths):
+        piece_type, piece_profile = types[type_code], profiles[profile_code]
+        yield index, f"{piece_type}_{piece_profile}_{index}", length, piece_type, piece_profile, dxf_filename
+
+def _header_cell(sheet, value):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    # Mesmo estilo de cabeçalho que o pandas aplicava (negrito, borda, centralizado)
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.font = Font(bold=True)
+    side = Side(style='thin')
+    cell.border = Border(left=side, right=side, top=side, bottom=side)
+    cell.alignment = Alignment(horizontal='center', vertical='top')
+    return cell
 
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        detalhamento_df.to_excel(writer, sheet_name='Detalhamento das Peças', index=False)
-        summary_df.to_excel(writer, sheet_name='Resumo por Perfil', index=False)
+def write_streaming_workbook(output_path, sheets):
+    """
+    Grava o .xlsx no modo write-only do openpyxl: cada linha vai direto para
+    o arquivo, sem montar a planilha inteira em memória.
+    sheets: [(nome da aba, colunas, iterável de linhas)].
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, columns, rows in sheets:
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append([_header_cell(sheet, column) for column in columns])
+        for row in rows:
+            sheet.append(row)
+    workbook.save(output_path)
+
+def export_detail_table(export_path, export_format, pieces_data, piece_index, dxf_filename):
+    """
+    Exporta o detalhamento das peças em formato colunar para outras
+    ferramentas: 'csv' (gravado linha a linha) ou 'parquet' (requer pyarrow).
+    Retorna False se o formato não puder ser gerado.
+    """
+    if export_format == 'csv':
+        with open(export_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(DETAIL_COLUMNS)
+            writer.writerows(_detail_rows(pieces_data, piece_index, dxf_filename))
+        return True
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401 (dependência opcional)
+        except ImportError:
+            print("Erro: exportação em Parquet requer o pacote 'pyarrow'.")
+            return False
+        import numpy as np
+        import pandas as pd
 
-    print(f"Relatório salvo com sucesso em: {output_path}")
-    
-    return summary_df
\ No newline at end of file
+        # Mesmas colunas (DETAIL_COLUMNS) do CSV e da aba de detalhamento
+        type_codes = np.frombuffer(pieces_data.type_codes, dtype=np.uint8)
+        profile_codes = np.frombuffer(pieces_data.profile_codes, dtype=np.uint32)
+        types = pd.Categorical.from_codes(type_codes, categories=pieces_data.types)
+        profiles = pd.Categorical.from_codes(profile_codes, categories=pieces_data.profiles)
+        names = (types.astype(str) + '_' + profiles.astype(str) + '_') + pd.Series(piece_index).astype(str)
+        pd.DataFrame(dict(zip(DETAIL_COLUMNS, [piece_index, names, pieces_data.length_array(), types, profiles,
+                                               dxf_filename]))).to_parquet(export_path, index=False)
+        return True
+    print(f"Erro: formato de exportação desconhecido: {export_format}.")
+    return False
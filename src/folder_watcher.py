@@ -0,0 +1,148 @@
+# src/folder_watcher.py
+
+import os
+import json
+import time
+import tempfile
+
+from src.batch_processor import run_batch
+from src.excel_reporter import report_path
+from src.piece_cache import analyzer_fingerprint, hash_file
+
+MANIFEST_FILENAME = '.manifest.json'
+DEFAULT_POLL_INTERVAL = 5.0
+# Tempo mínimo sem alteração antes de um arquivo ser considerado completo
+DEFAULT_SETTLE_TIME = 3.0
+
+class FolderWatcher:
+    """
+    Modo serviço: acompanha a pasta de DXF por polling e reprocessa apenas o
+    que mudou. Um manifesto (na pasta de relatórios) guarda, por arquivo,
+    tamanho, mtime, hash SHA-256 e relatório gerado.
+
+    A cada varredura só se faz stat dos arquivos; o hash é calculado apenas
+    quando tamanho ou mtime mudam (um 'touch' sem mudança de conteúdo não
+    gera reprocessamento). Arquivos ainda sendo gravados são adiados até
+    ficarem settle_time segundos sem mudar e serem vistos iguais em duas
+    varreduras seguidas.
+    Os relatórios têm nome fixo (sem timestamp), então arquivos inalterados
+    não geram relatórios novos.
+    progress_callback(concluídos, total, resultado), opcional, é repassado ao
+    run_batch de cada varredura (ex.: para emitir result['metricas'] com
+    collect_metrics=True).
+    """
+    def __init__(self, data_folder, reports_folder, interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME, workers=None, progress_callback=None, **options):
+        self.data_folder = data_folder
+        self.reports_folder = reports_folder
+        self.interval = interval
+        self.settle_time = settle_time
+        self.workers = workers
+        self.progress_callback = progress_callback
+        self.options = dict(options, timestamped=False)
+        self.manifest_path = os.path.join(reports_folder, MANIFEST_FILENAME)
+        self.manifest = self._load_manifest()
+        self._pending = {}  # nome -> (tamanho, mtime_ns) visto na varredura anterior
+
+    def _fingerprint(self):
+        return analyzer_fingerprint(self.options.get('streaming', False), self.options.get('cleanup', False))
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return {}
+        # Outra versão do analisador: tudo precisa ser refeito
+        if not isinstance(data, dict) or data.get('versao') != self._fingerprint():
+            return {}
+        return data.get('arquivos', {})
+
+    def _save_manifest(self):
+        os.makedirs(self.reports_folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.reports_folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'versao': self._fingerprint(), 'arquivos': self.manifest}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _scan(self):
+        """{nome: (tamanho, mtime_ns)} dos DXF da pasta, só com stat."""
+        found = {}
+        with os.scandir(self.data_folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.dxf') and entry.is_file():
+                    stat = entry.stat()
+                    found[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def _is_settled(self, name, signature, now):
+        # Um arquivo visto pela primeira vez nunca está pronto, qualquer que seja o
+        # mtime: cópias pelo Explorer/robocopy preservam o mtime da origem
+        previous = self._pending.get(name)
+        self._pending[name] = signature
+        old_enough = now - signature[1] / 1e9 >= self.settle_time
+        return old_enough and previous == signature
+
+    def poll_once(self):
+        """
+        Uma varredura: retorna (processados, removidos) e atualiza o manifesto.
+        """
+        now = time.time()
+        current = self._scan()
+        changed = []
+        manifest_dirty = False
+
+        for name, signature in sorted(current.items()):
+            entry = self.manifest.get(name)
+            if entry and (entry['tamanho'], entry['mtime_ns']) == signature:
+                self._pending.pop(name, None)
+                continue
+            if not self._is_settled(name, signature, now):
+                continue
+            del self._pending[name]
+            digest = hash_file(os.path.join(self.data_folder, name)).hexdigest()
+            if entry and entry['sha256'] == digest:
+                # Só o mtime mudou: atualiza o manifesto sem reprocessar
+                entry['tamanho'], entry['mtime_ns'] = signature
+                manifest_dirty = True
+                continue
+            changed.append((name, signature, digest))
+
+        removed = [name for name in self.manifest if name not in current]
+        for name in removed:
+            del self.manifest[name]
+            print(f"Arquivo removido da pasta: {name}")
+        for name in [name for name in self._pending if name not in current]:
+            del self._pending[name]
+
+        if changed:
+            file_paths = [os.path.join(self.data_folder, name) for name, _, _ in changed]
+            results = run_batch(file_paths, self.reports_folder, workers=self.workers,
+                                progress_callback=self.progress_callback, **self.options)
+            for (name, signature, digest), result in zip(changed, results):
+                if result['erro']:
+                    print(f"Falha em {name}: {result['erro']}")
+                self.manifest[name] = {
+                    'tamanho': signature[0],
+                    'mtime_ns': signature[1],
+                    'sha256': digest,
+                    'relatorio': report_path(name, self.reports_folder, timestamped=False)
+                                 if result['resumo'] is not None else None,
+                    'erro': result['erro'],
+                }
+
+        if changed or removed or manifest_dirty:
+            self._save_manifest()
+        return [name for name, _, _ in changed], removed
+
+    def run(self):
+        """Varre a pasta a cada 'interval' segundos até Ctrl+C."""
+        print(f"Monitorando '{self.data_folder}' a cada {self.interval:g}s (Ctrl+C para sair)...")
+        try:
+            while True:
+                processed, _ = self.poll_once()
+                if processed:
+                    print(f"{len(processed)} arquivo(s) reprocessado(s): {', '.join(processed)}")
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("\nMonitoramento encerrado.")
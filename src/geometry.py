@@ -0,0 +1,144 @@
+# src/geometry.py
+
+import numpy as np
+
+_ANGLE_TOL = 1e-12
+
+def segment_lengths(starts, ends, bulges=None):
+    """
+    Comprimento de segmentos retos ou em arco (bulge), vetorizado.
+    starts/ends: arrays (n, 3); bulges: array (n,) ou None.
+    Um bulge b descreve um arco de ângulo central 4*atan(|b|) sobre a corda.
+    """
+    chords = np.sqrt(((ends - starts) ** 2).sum(axis=1))
+    if bulges is None or not bulges.any():
+        return chords
+    angles = 4.0 * np.arctan(np.abs(bulges))
+    half_sin = np.sin(angles / 2.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arcs = chords * angles / (2.0 * half_sin)
+    return np.where(bulges != 0.0, arcs, chords)
+
+def arc_lengths(radii, start_angles, end_angles):
+    """
+    Comprimento de arcos (ângulos em graus, sentido anti-horário), com a
+    mesma convenção do ezdxf: ângulos iguais = 0; iguais após normalizar = 360.
+    """
+    spans = np.mod(end_angles - start_angles, 360.0)
+    same = np.isclose(start_angles, end_angles, rtol=0.0, atol=_ANGLE_TOL)
+    full = ~same & np.isclose(spans, 0.0, rtol=0.0, atol=_ANGLE_TOL)
+    spans = np.where(full, 360.0, np.where(same, 0.0, spans))
+    return np.abs(radii) * np.radians(spans)
+
+def straight_segment(entity):
+    """
+    Extremidades (WCS) de uma entidade que seja um único trecho reto: LINE ou
+    LWPOLYLINE/POLYLINE aberta com dois vértices e sem bulge. Senão, None.
+    """
+    dxftype = entity.dxftype()
+    if dxftype == 'LINE':
+        return entity.dxf.start.xyz, entity.dxf.end.xyz
+    if dxftype == 'LWPOLYLINE':
+        if entity.closed or len(entity) != 2 or any(b for _, _, b in entity.get_points('xyb')):
+            return None
+        start, end = entity.vertices_in_wcs()
+        return start.xyz, end.xyz
+    if dxftype == 'POLYLINE':
+        if not (entity.is_2d_polyline or entity.is_3d_polyline) or entity.is_closed or len(entity) != 2:
+            return None
+        if any(vertex.dxf.bulge for vertex in entity.vertices):
+            return None
+        start, end = entity.points_in_wcs()
+        return start.xyz, end.xyz
+    return None
+
+class LengthBatch:
+    """
+    Acumula a geometria de várias entidades em listas contíguas e calcula
+    todos os comprimentos de uma vez (compute), na ordem em que foram
+    adicionadas. Suporta LINE, LWPOLYLINE, POLYLINE (2D/3D, com bulge) e ARC.
+    """
+    def __init__(self):
+        self._count = 0
+        self._line_slots, self._line_coords = [], []
+        self._arc_slots, self._arc_values = [], []
+        self._poly_slots, self._poly_closed = [], []
+        self._vertex_coords, self._vertex_bulges, self._vertex_owner = [], [], []
+
+    def __len__(self):
+        return self._count
+
+    def _next_slot(self):
+        self._count += 1
+        return self._count - 1
+
+    def add_line(self, start, end):
+        self._line_slots.append(self._next_slot())
+        self._line_coords.append((start[0], start[1], start[2], end[0], end[1], end[2]))
+
+    def add_arc(self, radius, start_angle, end_angle):
+        self._arc_slots.append(self._next_slot())
+        self._arc_values.append((radius, start_angle, end_angle))
+
+    def add_polyline(self, points, closed=False):
+        """points: sequência de (x, y, z, bulge); o bulge vale do vértice ao seguinte."""
+        owner = len(self._poly_slots)
+        self._poly_slots.append(self._next_slot())
+        self._poly_closed.append(closed)
+        for x, y, z, bulge in points:
+            self._vertex_coords.append((x, y, z))
+            self._vertex_bulges.append(bulge)
+            self._vertex_owner.append(owner)
+
+    def add_entity(self, entity):
+        """Adiciona uma entidade ezdxf; retorna False se o tipo não for medido."""
+        dxftype = entity.dxftype()
+        if dxftype == 'LINE':
+            self.add_line(entity.dxf.start, entity.dxf.end)
+        elif dxftype == 'LWPOLYLINE':
+            self.add_polyline(((x, y, 0.0, b) for x, y, b in entity.get_points('xyb')), entity.closed)
+        elif dxftype == 'POLYLINE':
+            if not (entity.is_2d_polyline or entity.is_3d_polyline):
+                return False  # malhas e polyfaces não são barras
+            self.add_polyline(
+                ((*vertex.dxf.location.xyz, vertex.dxf.bulge) for vertex in entity.vertices),
+                entity.is_closed)
+        elif dxftype == 'ARC':
+            self.add_arc(entity.dxf.radius, entity.dxf.start_angle, entity.dxf.end_angle)
+        else:
+            return False
+        return True
+
+    def compute(self):
+        """Array com o comprimento de cada entidade adicionada, na mesma ordem."""
+        result = np.zeros(self._count, dtype=np.float64)
+        if self._line_slots:
+            coords = np.array(self._line_coords, dtype=np.float64)
+            result[self._line_slots] = segment_lengths(coords[:, :3], coords[:, 3:])
+        if self._arc_slots:
+            values = np.array(self._arc_values, dtype=np.float64)
+            result[self._arc_slots] = arc_lengths(values[:, 0], values[:, 1], values[:, 2])
+        if self._poly_slots:
+            result[self._poly_slots] = self._polyline_lengths()
+        return result
+
+    def _polyline_lengths(self):
+        count = len(self._poly_slots)
+        if not self._vertex_owner:
+            return np.zeros(count)
+        vertices = np.array(self._vertex_coords, dtype=np.float64)
+        bulges = np.array(self._vertex_bulges, dtype=np.float64)
+        owner = np.array(self._vertex_owner, dtype=np.int64)
+
+        # Segmentos entre vértices consecutivos da mesma polilinha
+        inner = np.flatnonzero(owner[:-1] == owner[1:])
+        # Segmento de fechamento (último -> primeiro) das polilinhas fechadas
+        # com pelo menos dois vértices
+        firsts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        lasts = np.r_[firsts[1:] - 1, len(owner) - 1]
+        closing = np.array(self._poly_closed, dtype=bool)[owner[firsts]] & (lasts > firsts)
+
+        starts = np.r_[inner, lasts[closing]]
+        ends = np.r_[inner + 1, firsts[closing]]
+        lengths = segment_lengths(vertices[starts], vertices[ends], bulges[starts])
+        return np.bincount(owner[starts], weights=lengths, minlength=count)
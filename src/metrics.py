@@ -0,0 +1,64 @@
+# src/metrics.py
+
+import time
+from contextlib import contextmanager, nullcontext
+
+# Etapas do pipeline, na ordem em que acontecem
+STAGES = ('cache', 'read', 'iterate', 'classify', 'measure', 'cleanup', 'aggregate', 'nest', 'write')
+
+class StageMetrics:
+    """
+    Cronômetros e contadores por etapa do pipeline.
+    Etapas podem ser aninhadas: o tempo de uma etapa interna é descontado da
+    externa, de modo que a soma dos tempos é o tempo total medido.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self._stack = []  # tempo das etapas internas, por nível
+
+    @contextmanager
+    def stage(self, name):
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self._stack.pop()
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - inner
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        ordered = {name: round(self.timings[name], 6) for name in STAGES if name in self.timings}
+        ordered.update({name: round(t, 6) for name, t in self.timings.items() if name not in ordered})
+        return {
+            'etapas_s': ordered,
+            'total_s': round(sum(self.timings.values()), 6),
+            'contadores': dict(self.counters),
+        }
+
+class _NullMetrics:
+    """Substituto sem custo quando as métricas estão desligadas."""
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def count(self, name, value=1):
+        pass
+
+NULL_METRICS = _NullMetrics()
+
+def format_timings(metrics_dict):
+    """Resumo legível: 'read 0.12s | iterate 0.30s | ... | total 0.50s'."""
+    parts = [f"{name} {seconds:.2f}s" for name, seconds in metrics_dict['etapas_s'].items()]
+    parts.append(f"total {metrics_dict['total_s']:.2f}s")
+    return ' | '.join(parts)
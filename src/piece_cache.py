@@ -0,0 +1,157 @@
+# src/piece_cache.py
+
+import os
+import json
+import zlib
+import struct
+import hashlib
+import tempfile
+
+from src.metrics import NULL_METRICS
+
+DEFAULT_CACHE_DIR = '.cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+CACHE_EXTENSION = '.pcs'
+_HASH_CHUNK = 1024 * 1024
+
+def analyzer_fingerprint(streaming=False, cleanup=False):
+    """
+    Identifica a versão/configuração do analisador. Qualquer mudança aqui
+    invalida as entradas antigas do cache.
+    O modo streaming entra na impressão digital porque não conta as peças
+    dos blocos; a limpeza, com suas tolerâncias, porque muda as peças.
+    """
+    # Importados aqui para que o módulo (usado por main.py e pela GUI só para
+    # limpar o cache) não carregue ezdxf e numpy na inicialização
+    from src import dxf_analyzer, segment_cleanup
+
+    config = {
+        'versao': dxf_analyzer.ANALYZER_VERSION,
+        'tipos': dxf_analyzer.VALID_TYPES,
+        'entidades': dxf_analyzer.MEASURED_ENTITY_TYPES,
+        'streaming': bool(streaming),
+        'limpeza': [segment_cleanup.DEFAULT_TOLERANCE, segment_cleanup.DEFAULT_ANGLE_TOLERANCE] if cleanup else None,
+    }
+    return json.dumps(config, sort_keys=True)
+
+def hash_file(file_path, digest=None):
+    """Atualiza (ou cria) um hash SHA-256 com o conteúdo do arquivo, lido em blocos."""
+    digest = digest or hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest
+
+def file_cache_key(file_path, streaming=False, cleanup=False):
+    """Hash SHA-256 do conteúdo do DXF somado à impressão digital do analisador."""
+    fingerprint = analyzer_fingerprint(streaming, cleanup).encode('utf-8')
+    return hash_file(file_path, hashlib.sha256(fingerprint)).hexdigest()
+
+class PieceCache:
+    """
+    Cache em disco das peças extraídas (PieceTable.to_bytes), endereçado
+    pelo conteúdo do DXF.
+    O tamanho total é limitado a max_bytes; ao estourar, as entradas usadas
+    há mais tempo (mtime, renovado a cada acerto) são removidas primeiro.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removida por outro processo
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        from src.piece_table import PieceTable
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                pieces = PieceTable.from_bytes(f.read())
+            os.utime(path)  # marca como usada recentemente (LRU)
+            return pieces
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error, struct.error):
+            # Entrada corrompida: descarta e trata como ausente
+            try: os.remove(path)
+            except OSError: pass
+            return None
+
+    def put(self, key, pieces):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Grava num temporário e renomeia: leitores nunca veem arquivo pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pieces.to_bytes())
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        self.evict()
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.remove(path); removed += 1
+            except OSError:
+                pass
+        return removed
+
+def cached_analyze_dxf_file(file_path, streaming=False, cache=None, stats=None, metrics=None, progress=None,
+                            cleanup=False, raise_errors=False):
+    """
+    Igual a analyze_dxf_file, mas consulta o cache antes: num acerto o DXF
+    não é interpretado pelo ezdxf (e stats só recebe 'cache'). Com
+    cache=None o cache é ignorado. O tempo de hash e leitura/gravação do
+    cache entra na etapa 'cache' de metrics. progress é repassado a
+    analyze_dxf_file (não é chamado num acerto), assim como raise_errors.
+    """
+    from src.dxf_analyzer import analyze_dxf_file
+
+    if cache is None or not os.path.exists(file_path):
+        return analyze_dxf_file(file_path, streaming=streaming, stats=stats, metrics=metrics, progress=progress,
+                                cleanup=cleanup, raise_errors=raise_errors)
+
+    metrics = metrics or NULL_METRICS
+    with metrics.stage('cache'):
+        key = file_cache_key(file_path, streaming, cleanup)
+        pieces = cache.get(key)
+    if pieces is not None:
+        if stats is not None: stats['cache'] = stats.get('cache', 0) + 1
+        metrics.count('pecas', len(pieces))
+        return pieces
+    pieces = analyze_dxf_file(file_path, streaming=streaming, stats=stats, metrics=metrics, progress=progress,
+                              cleanup=cleanup, raise_errors=raise_errors)
+    if pieces is not None:
+        with metrics.stage('cache'):
+            cache.put(key, pieces)
+    return pieces
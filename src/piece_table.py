@@ -0,0 +1,154 @@
+# src/piece_table.py
+
+import json
+import zlib
+import struct
+from array import array
+
+import numpy as np
+
+_MAGIC = b'TRC2'
+NO_HANDLE = 0
+
+class PieceTable:
+    """
+    Tabela colunar de peças extraídas do DXF.
+    Tipo e Perfil são guardados como códigos inteiros (categorias), o
+    comprimento como float64 e o handle da entidade de origem como inteiro
+    (0 = sem handle): ~21 bytes por peça, contra centenas num dicionário.
+    """
+    def __init__(self):
+        self.types = []      # código -> nome do Tipo
+        self.profiles = []   # código -> nome do Perfil
+        self._type_codes_by_name = {}
+        self._profile_codes_by_name = {}
+        self.type_codes = array('B')
+        self.profile_codes = array('I')
+        self.lengths = array('d')
+        self.handles = array('Q')
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __bool__(self):
+        return len(self.lengths) > 0
+
+    def type_code(self, name):
+        code = self._type_codes_by_name.get(name)
+        if code is None:
+            code = self._type_codes_by_name[name] = len(self.types)
+            self.types.append(name)
+        return code
+
+    def profile_code(self, name):
+        code = self._profile_codes_by_name.get(name)
+        if code is None:
+            code = self._profile_codes_by_name[name] = len(self.profiles)
+            self.profiles.append(name)
+        return code
+
+    def append(self, piece_type, piece_profile, length, handle=None):
+        self.type_codes.append(self.type_code(piece_type))
+        self.profile_codes.append(self.profile_code(piece_profile))
+        self.lengths.append(length)
+        self.handles.append(int(handle, 16) if handle else NO_HANDLE)
+
+    def extend(self, other, repeat=1):
+        """
+        Acrescenta as peças de outra PieceTable (repeat vezes seguidas),
+        recodificando as categorias.
+        """
+        type_map = [self.type_code(name) for name in other.types]
+        profile_map = [self.profile_code(name) for name in other.profiles]
+        self.type_codes.extend(array('B', (type_map[code] for code in other.type_codes)) * repeat)
+        self.profile_codes.extend(array('I', (profile_map[code] for code in other.profile_codes)) * repeat)
+        self.lengths.extend(other.lengths * repeat)
+        self.handles.extend(other.handles * repeat)
+
+    def with_lengths(self, lengths):
+        """Cópia da tabela com outros comprimentos (mesma ordem e quantidade de peças)."""
+        table = PieceTable()
+        table.extend(self)
+        table.lengths = array('d', np.asarray(lengths, dtype=np.float64).tobytes())
+        return table
+
+    def take(self, indices):
+        """Nova tabela só com as peças nas posições indices (na ordem dada)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        table = PieceTable()
+        for name in self.types: table.type_code(name)
+        for name in self.profiles: table.profile_code(name)
+        for column, source in ((table.type_codes, self.type_codes), (table.profile_codes, self.profile_codes),
+                               (table.lengths, self.lengths), (table.handles, self.handles)):
+            column.frombytes(np.frombuffer(source, dtype=source.typecode)[indices].tobytes())
+        return table
+
+    def scaled(self, factor):
+        """Cópia da tabela com todos os comprimentos multiplicados por factor."""
+        return self.with_lengths(self.length_array() * factor)
+
+    @classmethod
+    def from_records(cls, records):
+        """Constrói a tabela a partir da antiga lista de dicionários por peça."""
+        table = cls()
+        for record in records:
+            table.append(record['Tipo'], record['Perfil'], record['Comprimento (mm)'])
+        return table
+
+    def records(self):
+        """Gera um dicionário por peça (formato antigo, para compatibilidade)."""
+        for type_code, profile_code, length in zip(self.type_codes, self.profile_codes, self.lengths):
+            yield {'Tipo': self.types[type_code], 'Perfil': self.profiles[profile_code], 'Comprimento (mm)': length}
+
+    def length_array(self):
+        """Comprimentos como array NumPy, sem cópia."""
+        return np.frombuffer(self.lengths, dtype=np.float64)
+
+    def groups(self):
+        """
+        Agrupa as peças por (Tipo, Perfil) numa única passada (ordenação
+        estável pelos códigos). Retorna [(tipo, perfil, índices)] em ordem
+        alfabética de Tipo e Perfil; os índices de cada grupo ficam na ordem
+        original das peças.
+        """
+        if not self:
+            return []
+        keys = (np.frombuffer(self.type_codes, dtype=np.uint8).astype(np.int64) * len(self.profiles)
+                + np.frombuffer(self.profile_codes, dtype=np.uint32))
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        groups = []
+        for start, end in zip(starts, ends):
+            type_code, profile_code = divmod(int(sorted_keys[start]), len(self.profiles))
+            groups.append((self.types[type_code], self.profiles[profile_code], order[start:end]))
+        groups.sort(key=lambda group: (group[0], group[1]))
+        return groups
+
+    def to_bytes(self):
+        """Formato binário compacto (usado pelo cache de peças)."""
+        header = json.dumps({'tipos': self.types, 'perfis': self.profiles}).encode('utf-8')
+        payload = b''.join([
+            struct.pack('<II', len(header), len(self)), header,
+            self.type_codes.tobytes(), self.profile_codes.tobytes(),
+            self.lengths.tobytes(), self.handles.tobytes(),
+        ])
+        return _MAGIC + zlib.compress(payload)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Operação inversa de to_bytes."""
+        if data[:4] != _MAGIC:
+            raise ValueError("Tabela de peças com formato desconhecido.")
+        payload = zlib.decompress(data[4:])
+        header_size, count = struct.unpack_from('<II', payload)
+        offset = 8
+        header = json.loads(payload[offset:offset + header_size]); offset += header_size
+        table = cls()
+        for name in header['tipos']: table.type_code(name)
+        for name in header['perfis']: table.profile_code(name)
+        for column in (table.type_codes, table.profile_codes, table.lengths, table.handles):
+            size = column.itemsize * count
+            column.frombytes(payload[offset:offset + size]); offset += size
+        return table
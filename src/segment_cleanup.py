@@ -0,0 +1,226 @@
+# src/segment_cleanup.py
+
+from dataclasses import dataclass, field
+from itertools import product
+
+import numpy as np
+
+# Extremidades mais próximas que isto (mm) são consideradas o mesmo ponto
+DEFAULT_TOLERANCE = 0.5
+# Direções com ângulo menor que isto (rad) são consideradas a mesma
+DEFAULT_ANGLE_TOLERANCE = 1e-6
+
+# Multiplicadores do hash das células (chave, i, j, k), em aritmética uint64
+_HASH_FACTORS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5],
+                         dtype=np.uint64)
+_HASH_SALT = np.uint64(0xD6E8FEB86659FD93)
+
+@dataclass
+class CleanupResult:
+    """
+    Resultado de cleanup_segments, por índice de segmento.
+    keep: máscara dos segmentos que continuam sendo peças.
+    lengths: comprimento final de cada segmento (o mantido de uma fusão
+    recebe o comprimento do trecho inteiro).
+    duplicates: [(mantido, removido)]; merges: [(mantido, (absorvidos,), comprimento)].
+    """
+    keep: np.ndarray
+    lengths: np.ndarray
+    duplicates: list = field(default_factory=list)
+    merges: list = field(default_factory=list)
+
+    @property
+    def merged_count(self):
+        return sum(len(absorbed) for _, absorbed, _ in self.merges)
+
+def _snap(values, cell):
+    """Índice da célula da grade (tamanho cell) de cada valor: a chave do hash espacial."""
+    return np.floor(values / cell + 0.5).astype(np.int64)
+
+def _cell_hash(rows, salt):
+    """
+    Hash uint64 de cada linha (chave, i, j, k) de células. É linear: deslocar
+    a célula soma uma constante ao hash (módulo 2**64).
+    """
+    with np.errstate(over='ignore'):
+        return (rows.astype(np.uint64) * (_HASH_FACTORS + salt)).sum(axis=1, dtype=np.uint64)
+
+def _neighbour_pairs(keys, points, radius):
+    """
+    Pares (i, j), i < j, com a mesma chave inteira e pontos (n, 3) a até
+    radius um do outro. Hash espacial com células de lado radius: cada célula
+    ocupada é procurada nas 26 vizinhas, então pontos próximos em lados
+    opostos de uma divisa da grade também são encontrados; a distância é
+    sempre conferida.
+    """
+    rows = np.column_stack([keys, _snap(points, radius)])
+    salt = np.uint64(0)
+    while True:
+        hashes = _cell_hash(rows, salt)
+        order = np.argsort(hashes)
+        sorted_hashes = hashes[order]
+        new_cell = _runs(sorted_hashes[:, None])
+        firsts_of_cell = np.flatnonzero(new_cell)
+        # Células diferentes com o mesmo hash: troca o sal, para a busca ser exata
+        if np.array_equal(rows[order], rows[order[firsts_of_cell]][np.cumsum(new_cell) - 1]):
+            break
+        salt += _HASH_SALT
+    cell_hashes, cells = sorted_hashes[firsts_of_cell], rows[order[firsts_of_cell]]
+    counts = np.diff(np.append(firsts_of_cell, len(order)))
+
+    firsts, seconds = [], []
+    for offset in product((-1, 0, 1), repeat=points.shape[1]):
+        shift = np.array([(0, *offset)])
+        # Consultas em ordem crescente (a menos de uma volta do módulo): busca binária barata
+        with np.errstate(over='ignore'):
+            probes = cell_hashes + _cell_hash(shift, salt)[0]
+        found = np.minimum(np.searchsorted(cell_hashes, probes), len(cells) - 1)
+        source = np.flatnonzero((cell_hashes[found] == probes) & np.all(cells[found] == cells + shift, axis=1))
+        target = found[source]
+        # Todos os pontos da célula de origem com todos os da vizinha
+        pair_counts = counts[source] * counts[target]
+        pair_cell = np.repeat(np.arange(len(source)), pair_counts)
+        within = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        target_counts = counts[target][pair_cell]
+        first = order[firsts_of_cell[source][pair_cell] + within // target_counts]
+        second = order[firsts_of_cell[target][pair_cell] + within % target_counts]
+        close = (first < second) & (((points[first] - points[second]) ** 2).sum(axis=1) <= radius ** 2)
+        firsts.append(first[close])
+        seconds.append(second[close])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def _runs(keys):
+    """Para linhas já ordenadas, True onde começa um novo grupo de chaves iguais."""
+    starts = np.ones(len(keys), dtype=bool)
+    if len(keys) > 1:
+        starts[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+    return starts
+
+def find_duplicates(groups, starts, ends, tolerance=DEFAULT_TOLERANCE):
+    """
+    Segmentos repetidos: mesmo grupo e extremidades a até tolerance das de
+    outro segmento, em qualquer sentido. Os candidatos vêm do hash espacial
+    das extremidades (_neighbour_pairs) em vez da comparação de todos os
+    pares: O(n log n) para desenhos reais.
+    Retorna [(mantido, removido)], ordenado pelo removido; o mantido é o de
+    menor índice entre os repetidos.
+    """
+    count = len(groups)
+    # Cada segmento entra nos dois sentidos: (ponto, outra extremidade)
+    points, others = np.concatenate([starts, ends]), np.concatenate([ends, starts])
+    first, second = _neighbour_pairs(np.concatenate([groups, groups]), points, tolerance)
+    first_segment, second_segment = first % count, second % count
+    same = (first_segment != second_segment) & (((others[first] - others[second]) ** 2).sum(axis=1) <= tolerance ** 2)
+    kept, removed = np.minimum(first_segment, second_segment)[same], np.maximum(first_segment, second_segment)[same]
+
+    best = np.full(count, count, dtype=np.int64)
+    np.minimum.at(best, removed, kept)
+    duplicates, kept_of = [], {}
+    for index in np.flatnonzero(best < count).tolist():
+        # O mantido pode ele mesmo repetir um segmento anterior
+        kept_of[index] = kept_of.get(int(best[index]), int(best[index]))
+        duplicates.append((kept_of[index], index))
+    return duplicates
+
+def _components(count, first, second):
+    """Rótulo (menor índice) do componente conexo de cada item, dados os pares ligados."""
+    labels = np.arange(count)
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, first, labels[second])
+        np.minimum.at(updated, second, labels[first])
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+def merge_collinear(groups, starts, ends, tolerance=DEFAULT_TOLERANCE, angle_tolerance=DEFAULT_ANGLE_TOLERANCE):
+    """
+    Trechos de segmentos colineares do mesmo grupo que se tocam ou se
+    sobrepõem (folga de até tolerance). Os segmentos são indexados pela reta
+    suporte (direção e ponto mais próximo da origem, na grade); retas em
+    células vizinhas com direções a até angle_tolerance e pontos a até
+    tolerance são unidas (_neighbour_pairs), de modo que a divisa da grade
+    não separa trechos da mesma reta. Dentro de cada reta os segmentos são
+    ordenados pelo início da projeção: uma varredura linear junta os
+    intervalos encadeados. O(n log n) no total.
+    Retorna [(mantido, (absorvidos,), comprimento do trecho)], mantendo o
+    segmento de menor índice.
+    """
+    vectors = ends - starts
+    norms = np.sqrt((vectors ** 2).sum(axis=1))
+    valid = np.flatnonzero(norms > tolerance)
+    if len(valid) < 2:
+        return []
+    directions = vectors[valid] / norms[valid, None]
+    snapped_directions = _snap(directions, angle_tolerance)
+    # Sentido canônico da reta: primeira componente não nula positiva
+    first_nonzero = np.argmax(snapped_directions != 0, axis=1)
+    sign = np.where(snapped_directions[np.arange(len(valid)), first_nonzero] < 0, -1, 1)
+    directions *= sign[:, None]
+    snapped_directions *= sign[:, None]
+    offsets = starts[valid] - (starts[valid] * directions).sum(axis=1)[:, None] * directions
+
+    # Retas na grade; depois as vizinhas que são a mesma reta viram um rótulo só
+    line_keys = np.column_stack([groups[valid], snapped_directions, _snap(offsets, tolerance)])
+    _, first_of_line, line_of = np.unique(line_keys, axis=0, return_index=True, return_inverse=True)
+    line_of = line_of.ravel()
+    line_directions, line_offsets = directions[first_of_line], offsets[first_of_line]
+    first, second = _neighbour_pairs(groups[valid][first_of_line], line_offsets, tolerance)
+    parallel = np.linalg.norm(np.cross(line_directions[first], line_directions[second]), axis=1) <= angle_tolerance
+    labels = _components(len(first_of_line), first[parallel], second[parallel])[line_of]
+
+    # Projeções na direção da reta rotulada, para todos os seus segmentos terem o mesmo sentido
+    line_directions = line_directions[labels]
+    projections_start = (starts[valid] * line_directions).sum(axis=1)
+    projections_end = (ends[valid] * line_directions).sum(axis=1)
+    low = np.minimum(projections_start, projections_end)
+    high = np.maximum(projections_start, projections_end)
+
+    order = np.lexsort([low, labels])
+    new_line = _runs(labels[order, None]).tolist()
+
+    merges = []
+    low_sorted, high_sorted, members = low[order].tolist(), high[order].tolist(), valid[order].tolist()
+
+    def close_run(run, run_low, run_high):
+        if len(run) > 1:
+            kept = min(run)
+            merges.append((kept, tuple(sorted(index for index in run if index != kept)), run_high - run_low))
+
+    run, run_low, run_high = [], 0.0, 0.0
+    for new, segment_low, segment_high, index in zip(new_line, low_sorted, high_sorted, members):
+        if new or segment_low > run_high + tolerance:
+            close_run(run, run_low, run_high)
+            run, run_low, run_high = [index], segment_low, segment_high
+        else:
+            run.append(index)
+            run_high = max(run_high, segment_high)
+    close_run(run, run_low, run_high)
+    return merges
+
+def cleanup_segments(groups, starts, ends, lengths, tolerance=DEFAULT_TOLERANCE,
+                     angle_tolerance=DEFAULT_ANGLE_TOLERANCE):
+    """
+    Remove segmentos duplicados e depois funde os colineares encadeados.
+    groups: código inteiro por segmento (só segmentos do mesmo grupo, ex.
+    mesma layer, são comparados); starts/ends: arrays (n, 3); lengths:
+    comprimento já medido de cada segmento (mantido para os não alterados).
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+    keep = np.ones(len(groups), dtype=bool)
+    lengths = np.array(lengths, dtype=np.float64)
+    if len(groups) < 2:
+        return CleanupResult(keep, lengths)
+
+    duplicates = find_duplicates(groups, starts, ends, tolerance)
+    keep[[removed for _, removed in duplicates]] = False
+    remaining = np.flatnonzero(keep)
+    merges = [(int(remaining[kept]), tuple(int(remaining[index]) for index in absorbed), length)
+              for kept, absorbed, length in merge_collinear(groups[remaining], starts[remaining], ends[remaining],
+                                                            tolerance, angle_tolerance)]
+    for kept, absorbed, length in merges:
+        keep[list(absorbed)] = False
+        lengths[kept] = length
+    return CleanupResult(keep, lengths, duplicates, merges)
@@ -0,0 +1,430 @@
+# src/stock_cutting.py
+
+import math
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+from dataclasses import dataclass, field
+
+DEFAULT_STOCK_LENGTH = 6000
+DEFAULT_KERF = 4
+# Comprimentos iguais até esta casa decimal (mm) são tratados como a mesma peça
+LENGTH_DECIMALS = 6
+# Orçamento de tempo padrão do otimizador, em segundos
+DEFAULT_TIME_BUDGET = 2.0
+# Abaixo deste número de barras o otimizador passa para a busca exata
+_TAIL_BARS = 100
+_EPS = 1e-9
+
+@dataclass
+class CuttingPlan:
+    """
+    Plano de corte: cada barra é uma lista de (comprimento, quantidade),
+    na ordem em que as peças são cortadas.
+    Peças maiores que a barra não cabem em nenhum plano; ficam em 'oversized'
+    e consomem ceil(comprimento / barra) barras cada (emenda).
+    """
+    stock_length: float
+    kerf: float
+    bars: list = field(default_factory=list)
+    oversized: list = field(default_factory=list)
+    # Preenchidos pelo otimizador (optimize_stock_cutting)
+    lower_bound: int = None
+    proven_optimal: bool = False
+
+    @property
+    def gap(self):
+        """Barras acima do limite inferior (0 = ótimo garantido)."""
+        if self.lower_bound is None:
+            return None
+        return self.bar_count - self.lower_bound
+
+    @property
+    def bar_count(self):
+        return len(self.bars) + sum(math.ceil(length / self.stock_length) for length in self.oversized)
+
+    def used_length(self, bar):
+        """Comprimento consumido de uma barra, incluindo os cortes (kerf)."""
+        pieces = sum(qty for _, qty in bar)
+        return sum(length * qty for length, qty in bar) + self.kerf * (pieces - 1)
+
+    def leftovers(self):
+        """Sobra de cada barra do plano, em mm."""
+        return [self.stock_length - self.used_length(bar) for bar in self.bars]
+
+def aggregate_lengths(lengths, decimals=LENGTH_DECIMALS):
+    """
+    Agrupa comprimentos iguais (após arredondar) em {comprimento: quantidade}.
+    Cada grupo é representado pelo maior valor original dele, para que o
+    arredondamento nunca faça uma peça parecer menor do que é.
+    """
+    counts = Counter()
+    representative = {}
+    for length in lengths:
+        key = round(length, decimals)
+        counts[key] += 1
+        if length > representative.get(key, -math.inf):
+            representative[key] = length
+    return {representative[key]: qty for key, qty in counts.items()}
+
+def nest_stock_cutting(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF):
+    """
+    Mesmo critério guloso de sempre (a cada passo, corta da barra atual a maior
+    peça restante que ainda cabe; se nenhuma cabe, abre barra nova), mas sobre
+    os comprimentos agrupados em contagens e com busca binária na lista ordenada
+    de comprimentos distintos: O(n + barras * log d) em vez de quadrático.
+    Retorna um CuttingPlan com o plano barra a barra.
+    """
+    plan = CuttingPlan(stock_length, kerf)
+    counts = aggregate_lengths(lengths)
+    for length in [length for length in counts if length > stock_length]:
+        plan.oversized.extend([length] * counts.pop(length))
+
+    distinct = sorted(counts)  # ordem crescente, para bisect
+    while distinct:
+        remaining = stock_length
+        bar = []
+        while distinct:
+            # A primeira peça da barra não paga kerf; as seguintes sim
+            needed_kerf = kerf if bar else 0
+            idx = bisect_right(distinct, remaining - needed_kerf) - 1
+            # Ajuste fino: a subtração acima pode arredondar diferente do teste
+            # 'remaining >= length + kerf' usado no corte
+            while idx + 1 < len(distinct) and remaining >= distinct[idx + 1] + needed_kerf:
+                idx += 1
+            while idx >= 0 and remaining < distinct[idx] + needed_kerf:
+                idx -= 1
+            if idx < 0:
+                break
+            length = distinct[idx]
+            qty = 0
+            while counts[length] and remaining >= length + (kerf if bar or qty else 0):
+                if bar or qty: remaining -= kerf
+                remaining -= length
+                counts[length] -= 1
+                qty += 1
+            bar.append((length, qty))
+            if not counts[length]:
+                distinct.pop(idx)
+        plan.bars.append(bar)
+    return plan
+
+def _bins_lower_bound(sizes, counts, capacity):
+    """
+    Limite inferior rápido (usado em cada nó da busca) para itens já convertidos
+    (tamanho = peça + kerf, capacidade = barra + kerf): o maior entre o
+    comprimento total dividido pela barra e o número de itens maiores que meia
+    barra (dois deles nunca dividem a mesma barra).
+    """
+    total = sum(size * qty for size, qty in zip(sizes, counts))
+    by_length = math.ceil(total / capacity - _EPS) if total else 0
+    big_items = sum(qty for size, qty in zip(sizes, counts) if size > capacity / 2 + _EPS)
+    return max(by_length, big_items)
+
+def _martello_toth_bound(sizes, counts, capacity, deadline=None):
+    """
+    Limite inferior L2 de Martello & Toth para itens já convertidos
+    (tamanho = peça + kerf, capacidade = barra + kerf). Para cada limiar 'a':
+    itens maiores que capacidade - a ou que meia barra precisam de barra
+    própria, e os itens entre a e meia barra só podem ocupar a sobra delas.
+    Com a = 0 equivale ao comprimento total dividido pela barra.
+    Os tamanhos são ordenados uma vez e cada limiar é avaliado com somas
+    prefixadas e busca binária: O(d log d) para d tamanhos distintos. Se o
+    deadline passar no meio, retorna o melhor limiar já avaliado (com a = 0
+    avaliado primeiro, nunca pior que o comprimento total dividido pela barra).
+    """
+    items = sorted((size, qty) for size, qty in zip(sizes, counts) if qty)
+    if not items:
+        return 0
+    half = capacity / 2
+    ordered = [size for size, _ in items]
+    # prefix_count[k]/prefix_total[k]: quantidade e comprimento dos k menores tamanhos
+    prefix_count = [0, *accumulate(qty for _, qty in items)]
+    prefix_total = [0.0, *accumulate(size * qty for size, qty in items)]
+    half_end = bisect_right(ordered, half + _EPS)
+    # Itens maiores que meia barra: cada um em barra própria, qualquer que seja o limiar
+    over_half = prefix_count[-1] - prefix_count[half_end]
+    best = 0
+    for i, threshold in enumerate([0.0] + ordered[:half_end]):
+        if deadline is not None and i % 1024 == 1023 and time.perf_counter() > deadline:
+            return max(best, _bins_lower_bound(sizes, counts, capacity))
+        # Médios: meia barra < tamanho <= capacidade - limiar (o resto dos maiores é 'big')
+        medium_end = bisect_right(ordered, capacity - threshold + _EPS)
+        medium_count = prefix_count[medium_end] - prefix_count[half_end]
+        medium_free = medium_count * capacity - (prefix_total[medium_end] - prefix_total[half_end])
+        small_start = bisect_left(ordered, threshold - _EPS)
+        small_total = prefix_total[half_end] - prefix_total[small_start]
+        extra = max(0, math.ceil((small_total - medium_free) / capacity - _EPS))
+        best = max(best, over_half + extra)
+    return best
+
+def stock_cutting_lower_bound(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF, deadline=None):
+    """
+    Limite inferior de barras (inclui as barras das peças maiores que a barra).
+    deadline (time.perf_counter), opcional: ver _martello_toth_bound.
+    """
+    counts = aggregate_lengths(lengths)
+    oversized = sum(math.ceil(length / stock_length) * qty for length, qty in counts.items() if length > stock_length)
+    fitting = [(length, qty) for length, qty in counts.items() if length <= stock_length]
+    sizes = [length + kerf for length, _ in fitting]
+    return oversized + _martello_toth_bound(sizes, [qty for _, qty in fitting], stock_length + kerf, deadline)
+
+class _TimeBudgetExceeded(Exception):
+    pass
+
+class _OptimumReached(Exception):
+    pass
+
+class _BinCompletionSearch:
+    """
+    Branch-and-bound por "completamento de barras": a cada nível abre-se uma
+    barra que obrigatoriamente contém a maior peça restante e ramifica-se sobre
+    os padrões maximais (em que não cabe mais nenhuma peça restante), começando
+    pelo mais guloso. Podas pelo limite inferior e por estados (contagens
+    restantes) já alcançados com menos barras.
+    """
+    _MEMO_LIMIT = 200_000
+    _CHECK_EVERY = 256
+
+    def __init__(self, sizes, counts, capacity, best_count, target, deadline):
+        self.sizes = sizes  # ordem decrescente
+        self.capacity = capacity
+        self.counts = list(counts)
+        self.best_count = best_count
+        self.target = target  # limite inferior: ao atingi-lo, a busca termina
+        self.best_bins = None
+        self.deadline = deadline
+        self.memo = {}
+        self.nodes = 0
+
+    def run(self):
+        try:
+            self._search([], _bins_lower_bound(self.sizes, self.counts, self.capacity))
+        except _OptimumReached:
+            pass
+
+    def _search(self, bins, lower_bound):
+        self.nodes += 1
+        if self.nodes % self._CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise _TimeBudgetExceeded()
+        first = next((i for i, qty in enumerate(self.counts) if qty), None)
+        if first is None:
+            if len(bins) < self.best_count:
+                self.best_count = len(bins)
+                self.best_bins = [dict(pattern) for pattern in bins]
+                if self.best_count <= self.target:
+                    raise _OptimumReached()
+            return
+        if len(bins) + lower_bound >= self.best_count:
+            return
+        state = tuple(self.counts)
+        if self.memo.get(state, math.inf) <= len(bins):
+            return
+        if len(self.memo) > self._MEMO_LIMIT:
+            self.memo.clear()
+        self.memo[state] = len(bins)
+
+        self.counts[first] -= 1
+        for extra in self._patterns(first, self.capacity - self.sizes[first]):
+            pattern = dict(extra)
+            pattern[first] = pattern.get(first, 0) + 1
+            for i, qty in extra.items(): self.counts[i] -= qty
+            bins.append(pattern)
+            self._search(bins, _bins_lower_bound(self.sizes, self.counts, self.capacity))
+            bins.pop()
+            for i, qty in extra.items(): self.counts[i] += qty
+            if len(bins) + lower_bound >= self.best_count:
+                break
+        self.counts[first] += 1
+
+    def _patterns(self, start, free):
+        """
+        Gera os padrões maximais (peças extras além da maior), levando primeiro
+        o máximo das peças maiores. Iterativo para não aprofundar a recursão.
+        """
+        sizes, counts, n = self.sizes, self.counts, len(self.sizes)
+        chosen = [0] * n
+
+        def next_fitting(j, free):
+            while j < n and (not counts[j] or sizes[j] > free + _EPS):
+                j += 1
+            return j
+
+        frames = []  # [tipo, espaço antes dele, quantidade levada]
+        j = next_fitting(start, free)
+        while True:
+            if j < n:
+                take = min(counts[j], int((free + _EPS) // sizes[j]))
+                frames.append([j, free, take]); chosen[j] = take
+                free -= take * sizes[j]
+                j = next_fitting(j + 1, free)
+                continue
+            if all(counts[k] == chosen[k] or sizes[k] > free + _EPS for k in range(n)):
+                yield {k: qty for k, qty in enumerate(chosen) if qty}
+            # Retrocede: tira uma unidade do último tipo que ainda tem alguma
+            while frames and not frames[-1][2]:
+                chosen[frames.pop()[0]] = 0
+            if not frames:
+                return
+            frame = frames[-1]
+            frame[2] -= 1; chosen[frame[0]] = frame[2]
+            free = frame[1] - frame[2] * sizes[frame[0]]
+            j = next_fitting(frame[0] + 1, free)
+
+def _best_fill_pattern(sizes, counts, capacity, deadline):
+    """
+    Padrão (itens de uma barra) que mais aproveita a barra, usando no máximo
+    counts[j] itens de cada tipo; busca em profundidade com poda pelo espaço
+    ainda preenchível. Iterativa (pilha explícita, como _patterns): a
+    profundidade é o número de comprimentos distintos, que pode passar do
+    limite de recursão do Python.
+    """
+    n = len(sizes)
+    remaining_total = [0.0] * (n + 1)
+    for j in range(n - 1, -1, -1):
+        remaining_total[j] = remaining_total[j + 1] + sizes[j] * counts[j]
+    best = {'used': -1.0, 'pattern': {}}
+    chosen = {}
+    nodes = 0
+
+    def visit(j, free):
+        """Avalia o nó (tipos < j já decididos); retorna o quadro a empilhar ou None se podado."""
+        nonlocal nodes
+        nodes += 1
+        if nodes % 1024 == 0 and time.perf_counter() > deadline:
+            raise _TimeBudgetExceeded()
+        used = capacity - free
+        if used > best['used'] + _EPS:
+            best['used'] = used; best['pattern'] = dict(chosen)
+            if free <= _EPS:
+                raise _OptimumReached()
+        if j == n or used + min(free, remaining_total[j]) <= best['used'] + _EPS:
+            return None
+        return [j, free, min(counts[j], int((free + _EPS) // sizes[j]))]
+
+    try:
+        frames = [visit(0, capacity)]  # [tipo, espaço antes dele, próxima quantidade a tentar]
+        while frames and frames[-1] is not None:
+            frame = frames[-1]
+            j, free, qty = frame
+            if qty < 0:
+                frames.pop(); chosen.pop(j, None)
+                continue
+            frame[2] -= 1
+            if qty: chosen[j] = qty
+            else: chosen.pop(j, None)
+            child = visit(j + 1, free - qty * sizes[j])
+            if child is not None:
+                frames.append(child)
+    except _OptimumReached:
+        pass
+    return best['pattern']
+
+def _repeated_pattern(sizes, counts, capacity, deadline):
+    """
+    Escolha de padrão no estilo do procedimento sequencial de Haessler: tenta
+    primeiro padrões que possam ser repetidos muitas vezes (no máximo
+    counts[j] // repetições de cada tipo) e aceita o primeiro cuja sobra não
+    ultrapasse a sobra média que um plano no limite inferior teria.
+    """
+    bars = _bins_lower_bound(sizes, counts, capacity)
+    total = sum(size * qty for size, qty in zip(sizes, counts))
+    allowed_waste = (bars * capacity - total) / bars
+    repeats = bars
+    while repeats > 1:
+        pattern = _best_fill_pattern(sizes, [qty // repeats for qty in counts], capacity, deadline)
+        used = sum(sizes[i] * qty for i, qty in pattern.items())
+        if pattern and capacity - used <= allowed_waste + _EPS:
+            return pattern
+        repeats //= 2
+    return _best_fill_pattern(sizes, counts, capacity, deadline)
+
+def _fill_bound(sizes, counts, capacity, deadline):
+    """
+    Limite pelo melhor aproveitamento possível de uma barra: nenhuma barra
+    recebe mais que o padrão de melhor preenchimento, então o total dividido
+    por ele é um limite inferior (forte quando há poucos comprimentos).
+    """
+    pattern = _best_fill_pattern(sizes, counts, capacity, deadline)
+    best_fill = sum(sizes[i] * qty for i, qty in pattern.items())
+    if best_fill <= 0:
+        return 0
+    total = sum(size * qty for size, qty in zip(sizes, counts))
+    return math.ceil(total / best_fill - _EPS)
+
+def optimize_stock_cutting(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF,
+                           time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Otimizador do plano de corte com orçamento de tempo (segundos), semeado
+    com o resultado guloso (nest_stock_cutting):
+    1. enquanto restam muitas barras, repete o padrão de melhor aproveitamento
+       o máximo de vezes possível (pedidos grandes têm poucos comprimentos
+       distintos repetidos muitas vezes);
+    2. o restante é resolvido por branch-and-bound (_BinCompletionSearch).
+    Para cedo ao atingir o limite inferior (ótimo provado) ou o orçamento,
+    e só troca o plano guloso se encontrar um com menos barras; qualquer
+    falha inesperada do otimizador também devolve o plano guloso.
+    O CuttingPlan retornado traz lower_bound, proven_optimal e gap (0 quando
+    o ótimo foi provado).
+    """
+    deadline = time.perf_counter() + time_budget
+    try:
+        return _optimize(lengths, stock_length, kerf, deadline)
+    except Exception as e:
+        print(f"Aviso: otimização do plano de corte falhou ({type(e).__name__}: {e}); usando o plano guloso.")
+        return nest_stock_cutting(lengths, stock_length, kerf)
+
+def _optimize(lengths, stock_length, kerf, deadline):
+    plan = nest_stock_cutting(lengths, stock_length, kerf)
+    plan.lower_bound = stock_cutting_lower_bound(lengths, stock_length, kerf, deadline)
+
+    # Uma barra de comprimento B com k peças consome soma(peças) + (k-1)*kerf,
+    # ou seja: itens de tamanho peça+kerf numa barra de capacidade B+kerf
+    aggregated = aggregate_lengths(lengths)
+    lengths_desc = sorted((length for length in aggregated if length <= stock_length), reverse=True)
+    sizes = [length + kerf for length in lengths_desc]
+    counts = [aggregated[length] for length in lengths_desc]
+    capacity = stock_length + kerf
+    try:
+        plan.lower_bound = max(plan.lower_bound, plan.bar_count - len(plan.bars)
+                               + _fill_bound(sizes, counts, capacity, deadline))
+    except _TimeBudgetExceeded:
+        pass
+    if plan.bar_count <= plan.lower_bound:
+        plan.proven_optimal = True
+        return plan
+
+    bins = []
+    exhaustive = True
+    try:
+        while _bins_lower_bound(sizes, counts, capacity) > _TAIL_BARS:
+            exhaustive = False
+            pattern = _repeated_pattern(sizes, counts, capacity, deadline)
+            repeats = min(counts[i] // qty for i, qty in pattern.items())
+            for i, qty in pattern.items(): counts[i] -= qty * repeats
+            bins.extend([pattern] * repeats)
+
+        tail = nest_stock_cutting([length for length, qty in zip(lengths_desc, counts) for _ in range(qty)],
+                                  stock_length, kerf)
+        target = max(_martello_toth_bound(sizes, counts, capacity, deadline), _fill_bound(sizes, counts, capacity, deadline))
+        search = _BinCompletionSearch(sizes, counts, capacity, len(tail.bars), target, deadline)
+        try:
+            search.run()
+        except _TimeBudgetExceeded:
+            exhaustive = False
+        if search.best_bins is not None:
+            bins.extend(search.best_bins)
+        else:
+            index = {length: i for i, length in enumerate(lengths_desc)}
+            bins.extend({index[length]: qty for length, qty in bar} for bar in tail.bars)
+    except _TimeBudgetExceeded:
+        bins = None
+
+    if bins is not None and len(bins) < len(plan.bars):
+        plan.bars = [[(lengths_desc[i], qty) for i, qty in sorted(pattern.items())] for pattern in bins]
+    plan.proven_optimal = exhaustive or plan.bar_count <= plan.lower_bound
+    if plan.proven_optimal:
+        # Busca exaustiva: o próprio plano é o limite inferior (gap 0)
+        plan.lower_bound = plan.bar_count
+    return plan
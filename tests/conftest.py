@@ -0,0 +1,7 @@
+# tests/conftest.py
+# Permite 'from src.x import y' (como em main.py) rodando o pytest de qualquer pasta.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,90 @@
+# tests/test_block_analyzer.py
+
+from collections import Counter
+
+import ezdxf
+import pytest
+from ezdxf import path as ezdxf_path
+
+from src.dxf_analyzer import analyze_dxf_file
+
+def new_document():
+    doc = ezdxf.new()
+    truss = doc.blocks.new('TRELICA')
+    truss.add_line((0, 0), (1000, 0))                                          # layer '0': herda
+    truss.add_line((0, 0), (0, 500), dxfattribs={'layer': 'MONTANTE_L_40_3'})
+    return doc
+
+def pieces(doc, tmp_path, **kwargs):
+    """Counter de (Tipo, Perfil, comprimento arredondado) das peças do DXF gravado."""
+    path = str(tmp_path / 'blocos.dxf')
+    doc.saveas(path)
+    stats = {}
+    table = analyze_dxf_file(path, stats=stats, **kwargs)
+    counted = Counter((r['Tipo'], r['Perfil'], round(r['Comprimento (mm)'], 6)) for r in table.records())
+    return counted, stats
+
+def test_layer_zero_inherits_insert_layer(tmp_path):
+    doc = new_document()
+    doc.modelspace().add_blockref('TRELICA', (0, 0), dxfattribs={'layer': 'BANZO_U_100'})
+    doc.modelspace().add_blockref('TRELICA', (0, 5000))  # na layer '0': a linha herdada não é peça
+    counted, stats = pieces(doc, tmp_path)
+    assert counted == Counter({('BANZO', 'U_100', 1000.0): 1, ('MONTANTE', 'L_40_3', 500.0): 2})
+    assert stats['insercoes'] == 2
+
+def test_nested_blocks_with_uniform_scale_rotation_and_mirror(tmp_path):
+    doc = new_document()
+    frame = doc.blocks.new('PORTICO')
+    frame.add_blockref('TRELICA', (0, 0), dxfattribs={'xscale': 2, 'yscale': 2, 'zscale': 2, 'rotation': 90})
+    frame.add_blockref('TRELICA', (0, 0), dxfattribs={'xscale': -1})  # espelhada
+    doc.modelspace().add_blockref('PORTICO', (0, 0), dxfattribs={'layer': 'DIAGONAL_X', 'rotation': 30})
+    counted, stats = pieces(doc, tmp_path)
+    assert counted == Counter({('DIAGONAL', 'X', 2000.0): 1, ('DIAGONAL', 'X', 1000.0): 1,
+                               ('MONTANTE', 'L_40_3', 1000.0): 1, ('MONTANTE', 'L_40_3', 500.0): 1})
+    assert stats['blocos'] == 2
+
+def test_minsert_counts_every_grid_cell(tmp_path):
+    doc = new_document()
+    insert = doc.modelspace().add_blockref('TRELICA', (0, 0), dxfattribs={'layer': 'BANZO_U_100'})
+    insert.grid(size=(2, 3), spacing=(2000, 3000))
+    counted, stats = pieces(doc, tmp_path)
+    assert counted == Counter({('BANZO', 'U_100', 1000.0): 6, ('MONTANTE', 'L_40_3', 500.0): 6})
+    assert stats['insercoes'] == 6
+
+def test_non_uniform_scale_remeasures_entities(tmp_path):
+    doc = new_document()
+    doc.blocks.get('TRELICA').add_arc((0, 0), radius=100, start_angle=0, end_angle=90,
+                                      dxfattribs={'layer': 'DIAGONAL_X'})
+    insert = doc.modelspace().add_blockref('TRELICA', (0, 0), dxfattribs={'layer': 'BANZO_U_100', 'xscale': 2,
+                                                                          'rotation': 45})
+    counted, _ = pieces(doc, tmp_path)
+    # Referência: a entidade explodida (elipse) medida por uma aproximação fina
+    ellipse = next(e for e in insert.virtual_entities() if e.dxftype() == 'ELLIPSE')
+    points = list(ezdxf_path.make_path(ellipse).flattening(0.0001))
+    expected_arc = sum(a.distance(b) for a, b in zip(points, points[1:]))
+    arc_lengths = [length for (piece_type, _, length) in counted if piece_type == 'DIAGONAL']
+    assert arc_lengths == [pytest.approx(expected_arc, abs=0.05)]
+    assert counted[('BANZO', 'U_100', 2000.0)] == 1
+    assert counted[('MONTANTE', 'L_40_3', 500.0)] == 1
+
+def test_instances_memoized_by_gram_matrix(tmp_path):
+    doc = new_document()
+    msp = doc.modelspace()
+    for i in range(30):
+        # Mesma escala com rotações diferentes: mesma matriz de Gram, mesmos comprimentos
+        msp.add_blockref('TRELICA', (i * 3000, 0), dxfattribs={'layer': 'BANZO_U_100', 'xscale': 2,
+                                                               'rotation': 90 * (i % 2)})
+    counted, stats = pieces(doc, tmp_path)
+    assert counted == Counter({('BANZO', 'U_100', 2000.0): 30, ('MONTANTE', 'L_40_3', 500.0): 30})
+    assert stats['blocos'] == 1
+
+def test_circular_references_are_ignored(tmp_path, capsys):
+    doc = ezdxf.new()
+    first, second = doc.blocks.new('A'), doc.blocks.new('B')
+    first.add_line((0, 0), (100, 0), dxfattribs={'layer': 'BANZO_X'})
+    first.add_blockref('B', (0, 0))
+    second.add_blockref('A', (0, 0))
+    doc.modelspace().add_blockref('A', (0, 0))
+    counted, _ = pieces(doc, tmp_path)
+    assert counted == Counter({('BANZO', 'X', 100.0): 1})
+    assert "referência circular" in capsys.readouterr().out
@@ -0,0 +1,83 @@
+# tests/test_geometry.py
+
+import math
+import random
+
+import ezdxf
+import pytest
+from ezdxf.math import arc_angle_span_deg, bulge_to_arc
+
+from src.geometry import LengthBatch
+from src.dxf_analyzer import get_length
+
+def original_get_length(entity):
+    """get_length original (laço de math.dist), referência para LINE e LWPOLYLINE reta."""
+    if entity.dxftype() == 'LINE':
+        return math.dist(entity.dxf.start, entity.dxf.end)
+    elif entity.dxftype() == 'LWPOLYLINE':
+        with entity.points() as points:
+            length = 0.0
+            if len(points) < 2: return 0.0
+            for i in range(len(points) - 1):
+                length += math.dist(points[i], points[i + 1])
+            if entity.is_closed:
+                length += math.dist(points[-1], points[0])
+            return length
+    return 0
+
+def bulge_length(start, end, bulge):
+    if not bulge:
+        return math.dist(start, end)
+    _, start_angle, end_angle, radius = bulge_to_arc(start, end, bulge)
+    return radius * ((end_angle - start_angle) % math.tau)
+
+def measure(entities):
+    batch = LengthBatch()
+    for entity in entities:
+        assert batch.add_entity(entity)
+    return batch.compute().tolist()
+
+@pytest.fixture
+def msp():
+    return ezdxf.new().modelspace()
+
+def test_lines_and_straight_polylines_match_original(msp):
+    rng = random.Random(0)
+    coordinate = lambda: rng.uniform(-1e5, 1e5)
+    entities = []
+    for _ in range(3000):
+        entities.append(msp.add_line((coordinate(), coordinate(), coordinate()), (coordinate(), coordinate(), coordinate())))
+        points = [(coordinate(), coordinate()) for _ in range(rng.randint(1, 8))]
+        entities.append(msp.add_lwpolyline(points, close=rng.random() < 0.3))
+    for entity, length in zip(entities, measure(entities)):
+        assert abs(length - original_get_length(entity)) <= 1e-9
+
+def test_bulged_and_closed_polylines(msp):
+    rng = random.Random(1)
+    for _ in range(500):
+        points = [(rng.uniform(-5000, 5000), rng.uniform(-5000, 5000), rng.choice([0.0, rng.uniform(-3, 3)]))
+                  for _ in range(rng.randint(2, 6))]
+        closed = rng.random() < 0.5
+        entity = msp.add_lwpolyline(points, format='xyb', close=closed)
+        pairs = list(zip(points, points[1:] + (points[:1] if closed else [])))
+        expected = sum(bulge_length(start[:2], end[:2], start[2]) for start, end in pairs)
+        assert measure([entity])[0] == pytest.approx(expected, rel=1e-9)
+    # Semicírculo: bulge 1 sobre uma corda de 2 mm = pi mm
+    assert measure([msp.add_lwpolyline([(0, 0, 1), (2, 0, 0)], format='xyb')])[0] == pytest.approx(math.pi)
+
+def test_polyline_entities(msp):
+    square = msp.add_polyline2d([(0, 0), (100, 0), (100, 100), (0, 100)], close=True)
+    spatial = msp.add_polyline3d([(0, 0, 0), (0, 0, 30), (40, 0, 30)])
+    assert measure([square, spatial]) == pytest.approx([400.0, 70.0])
+
+@pytest.mark.parametrize('start_angle, end_angle', [
+    (0, 90), (350, 10), (10, 10), (0, 360), (90, 450), (-30, 30), (200, 100), (10, 730)])
+def test_arc_spans_follow_ezdxf(msp, start_angle, end_angle):
+    arc = msp.add_arc((0, 0), radius=250, start_angle=start_angle, end_angle=end_angle)
+    expected = 250 * math.radians(arc_angle_span_deg(start_angle, end_angle))
+    assert measure([arc])[0] == pytest.approx(expected, abs=1e-9)
+    assert get_length(arc) == pytest.approx(expected, abs=1e-9)
+
+def test_unsupported_entities_are_rejected(msp):
+    assert not LengthBatch().add_entity(msp.add_circle((0, 0), 10))
+    assert not LengthBatch().add_entity(msp.add_text('1200'))
@@ -0,0 +1,73 @@
+# tests/test_piece_table.py
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.excel_reporter import DETAIL_COLUMNS, create_excel_report
+from src.piece_table import PieceTable
+from test_stock_cutting import original_greedy
+
+def random_records(seed, count=400):
+    rng = random.Random(seed)
+    profiles = {'BANZO': ['U_100_50_3', 'TUBO_60_3'], 'MONTANTE': ['L_40_3'], 'DIAGONAL': ['U_50_25_2', 'L_40_3']}
+    records = []
+    for _ in range(count):
+        piece_type = rng.choice(sorted(profiles))
+        records.append({'Tipo': piece_type, 'Perfil': rng.choice(profiles[piece_type]),
+                        'Comprimento (mm)': round(rng.uniform(100, 5900), rng.choice([0, 2, 6]))})
+    return records
+
+def original_report(records, dxf_filename):
+    """Detalhamento e resumo como o create_excel_report original os montava (DataFrame por peça)."""
+    df = pd.DataFrame(records)
+    df['Arquivo DXF'] = dxf_filename
+    df['Índice'] = df.groupby(['Tipo', 'Perfil']).cumcount() + 1
+    df['Peça'] = df['Tipo'] + '_' + df['Perfil'] + '_' + df['Índice'].astype(str)
+    detail = df[DETAIL_COLUMNS]
+    summary = df.groupby(['Tipo', 'Perfil']).agg(**{
+        'Quantidade de Peças': ('Comprimento (mm)', 'count'),
+        'Comprimento Total (mm)': ('Comprimento (mm)', 'sum'),
+    }).reset_index()
+    summary['Barras de 6m Necessárias'] = [
+        original_greedy(df[(df['Tipo'] == row['Tipo']) & (df['Perfil'] == row['Perfil'])]['Comprimento (mm)'].tolist())
+        for _, row in summary.iterrows()]
+    return detail, summary
+
+def test_table_round_trips_records_and_bytes():
+    records = random_records(1)
+    table = PieceTable.from_records(records)
+    assert list(table.records()) == records
+    restored = PieceTable.from_bytes(table.to_bytes())
+    assert list(restored.records()) == records
+    assert restored.handles == table.handles
+
+def test_groups_partition_in_original_order():
+    table = PieceTable.from_records(random_records(2))
+    groups = table.groups()
+    assert [(t, p) for t, p, _ in groups] == sorted({(t, p) for t, p, _ in groups})
+    indices = np.concatenate([indices for _, _, indices in groups])
+    assert sorted(indices.tolist()) == list(range(len(table)))
+    for piece_type, profile, group_indices in groups:
+        assert list(group_indices) == sorted(group_indices)
+        assert all(table.types[table.type_codes[i]] == piece_type for i in group_indices)
+        assert all(table.profiles[table.profile_codes[i]] == profile for i in group_indices)
+
+def test_report_matches_original_dataframe_report(tmp_path):
+    records = random_records(3)
+    expected_detail, expected_summary = original_report(records, 'trelica.dxf')
+    summary = create_excel_report(PieceTable.from_records(records), 'trelica.dxf', str(tmp_path), timestamped=False)
+    pd.testing.assert_frame_equal(summary, expected_summary, check_dtype=False)
+
+    workbook = tmp_path / 'Relatorio_trelica.xlsx'
+    detail_sheet = pd.read_excel(workbook, sheet_name='Detalhamento das Peças')
+    summary_sheet = pd.read_excel(workbook, sheet_name='Resumo por Perfil')
+    pd.testing.assert_frame_equal(detail_sheet, expected_detail.reset_index(drop=True), check_dtype=False)
+    pd.testing.assert_frame_equal(summary_sheet, expected_summary, check_dtype=False)
+
+def test_report_accepts_old_list_of_dicts():
+    records = random_records(4)
+    from_records = create_excel_report(records, 'a.dxf', '.', write_report=False)
+    from_table = create_excel_report(PieceTable.from_records(records), 'a.dxf', '.', write_report=False)
+    pd.testing.assert_frame_equal(from_records, from_table)
@@ -0,0 +1,165 @@
+# tests/test_segment_cleanup.py
+
+import random
+
+import ezdxf
+import numpy as np
+
+from src.dxf_analyzer import analyze_dxf_file
+from src.segment_cleanup import cleanup_segments, find_duplicates, merge_collinear
+
+def as_arrays(segments):
+    groups = np.array([group for group, _, _ in segments], dtype=np.int64)
+    starts = np.array([start for _, start, _ in segments], dtype=np.float64)
+    ends = np.array([end for _, _, end in segments], dtype=np.float64)
+    return groups, starts, ends
+
+def cleanup(segments):
+    groups, starts, ends = as_arrays(segments)
+    lengths = np.sqrt(((ends - starts) ** 2).sum(axis=1))
+    return cleanup_segments(groups, starts, ends, lengths)
+
+def test_duplicates_in_either_direction_and_within_tolerance():
+    segments = [
+        (0, (0, 0, 0), (1000, 0, 0)),
+        (0, (1000, 0, 0), (0, 0, 0)),        # invertida
+        (0, (0.1, -0.1, 0), (1000.1, 0, 0)),  # dentro da tolerância
+        (1, (0, 0, 0), (1000, 0, 0)),        # outro grupo: não é duplicata
+    ]
+    assert sorted(find_duplicates(*as_arrays(segments))) == [(0, 1), (0, 2)]
+
+def test_collinear_chain_is_merged_into_lowest_index():
+    segments = [
+        (0, (2000, 0, 0), (3000, 0, 0)),
+        (0, (0, 0, 0), (1000, 0, 0)),
+        (0, (2000, 0, 0), (1000, 0, 0)),     # invertida, no meio da cadeia
+        (0, (3500, 0, 0), (4000, 0, 0)),     # separada por 500 mm: não encosta
+        (0, (0, 0, 0), (0, 1000, 0)),        # outra direção
+    ]
+    result = cleanup(segments)
+    assert result.duplicates == []
+    assert [(kept, absorbed) for kept, absorbed, _ in result.merges] == [(0, (1, 2))]
+    assert result.lengths[0] == 3000.0
+    assert result.keep.tolist() == [True, False, False, True, True]
+    assert result.merged_count == 2
+
+def test_overlapping_segments_merge_to_covered_length():
+    segments = [
+        (0, (0, 0, 0), (1500, 1500, 0)),
+        (0, (1000, 1000, 0), (3000, 3000, 0)),
+    ]
+    result = cleanup(segments)
+    assert result.keep.tolist() == [True, False]
+    assert abs(result.lengths[0] - 3000 * np.sqrt(2)) < 1e-6
+
+def test_parallel_offset_and_other_groups_are_not_merged():
+    segments = [
+        (0, (0, 0, 0), (1000, 0, 0)),
+        (0, (1000, 10, 0), (2000, 10, 0)),   # paralela, 10 mm acima
+        (1, (1000, 0, 0), (2000, 0, 0)),     # colinear, mas de outro grupo
+    ]
+    assert merge_collinear(*as_arrays(segments)) == []
+    assert cleanup(segments).keep.all()
+
+def test_duplicates_removed_before_merging():
+    segments = [
+        (0, (0, 0, 0), (1000, 0, 0)),
+        (0, (1000, 0, 0), (2000, 0, 0)),
+        (0, (0, 0, 0), (1000, 0, 0)),
+    ]
+    result = cleanup(segments)
+    assert result.duplicates == [(0, 2)]
+    assert [(kept, absorbed) for kept, absorbed, _ in result.merges] == [(0, (1,))]
+    assert result.keep.tolist() == [True, False, False]
+    assert result.lengths[0] == 2000.0
+
+def test_duplicates_match_pairwise_reference():
+    rng = random.Random(0)
+    points = [(rng.randrange(0, 5) * 1000.0, rng.randrange(0, 5) * 1000.0, 0.0) for _ in range(12)]
+    segments = []
+    for _ in range(300):
+        start, end = rng.sample(points, 2)
+        segments.append((rng.randrange(2), start, end))
+    expected = set()
+    for j, (group, start, end) in enumerate(segments):
+        for i in range(j):
+            other_group, other_start, other_end = segments[i]
+            if group == other_group and {start, end} == {other_start, other_end}:
+                expected.add(j)
+                break
+    assert {removed for _, removed in find_duplicates(*as_arrays(segments))} == expected
+
+def test_cell_boundary_does_not_split_duplicates_or_lines():
+    # y = 0.24 e 0.26 ficam em células diferentes da grade de 0.5 mm
+    segments = [
+        (0, (0, 0.24, 0), (1000, 0.24, 0)),
+        (0, (1000, 0.26, 0), (0, 0.26, 0)),      # duplicada, do outro lado da divisa
+        (0, (1000, 0.26, 0), (2000, 0.26, 0)),   # continua a primeira
+        (0, (2000, 0.24, 0), (2000.26, 0.24, 0)),  # curta demais para ter direção própria
+        (0, (0, 0.74, 0), (-1000, 0.74, 0)),    # paralela a 0.5 mm: também encosta
+    ]
+    assert find_duplicates(*as_arrays(segments)) == [(0, 1)]
+    result = cleanup(segments)
+    assert [(kept, absorbed) for kept, absorbed, _ in result.merges] == [(0, (2, 4))]
+    assert abs(result.lengths[0] - 3000.0) < 1e-6
+    assert result.keep.tolist() == [True, False, False, True, False]
+
+def test_duplicates_match_pairwise_reference_with_noise():
+    rng = random.Random(1)
+    points = [(rng.randrange(0, 4) * 1000.0 + 0.25, rng.randrange(0, 4) * 1000.0 - 0.25, 0.0) for _ in range(10)]
+    jitter = lambda point: tuple(value + rng.uniform(-0.1, 0.1) for value in point)
+    segments = [(rng.randrange(2), *map(jitter, rng.sample(points, 2))) for _ in range(300)]
+    close = lambda a, b: np.linalg.norm(np.subtract(a, b)) <= 0.5
+    expected = {j for j, (group, start, end) in enumerate(segments)
+                if any(group == other_group and ((close(start, other_start) and close(end, other_end))
+                                                 or (close(start, other_end) and close(end, other_start)))
+                       for other_group, other_start, other_end in segments[:j])}
+    assert {removed for _, removed in find_duplicates(*as_arrays(segments))} == expected
+
+def without_entity_handles(path):
+    """Regrava o DXF sem os handles (código 5) das entidades, como os arquivos R12 sem $HANDLING."""
+    with open(path) as file:
+        lines = file.read().splitlines()
+    kept, in_entities = [], False
+    for code, value in zip(lines[::2], lines[1::2]):
+        if code.strip() == '2' and value.strip() == 'ENTITIES':
+            in_entities = True
+        elif code.strip() == '0' and value.strip() == 'ENDSEC':
+            in_entities = False
+        if not (in_entities and code.strip() == '5'):
+            kept += [code, value]
+    with open(path, 'w') as file:
+        file.write('\n'.join(kept) + '\n')
+
+def test_streaming_cleanup_without_handles(tmp_path, capsys):
+    doc = ezdxf.new('R12')
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (1000, 0), dxfattribs={'layer': 'BANZO_X'})
+    msp.add_line((0, 0), (1000, 0), dxfattribs={'layer': 'BANZO_X'})     # duplicada
+    msp.add_line((1000, 0), (2500, 0), dxfattribs={'layer': 'BANZO_X'})  # continua a primeira
+    msp.add_line((0, 0), (0, 700), dxfattribs={'layer': 'MONTANTE_Y'})
+    msp.add_line((0, 0), (0, 700), dxfattribs={'layer': 'MONTANTE_Y'})   # duplicada
+    path = str(tmp_path / 'r12.dxf')
+    doc.saveas(path)
+    without_entity_handles(path)
+    stats = {}
+    table = analyze_dxf_file(path, streaming=True, cleanup=True, stats=stats)
+    assert not any(table.handles)
+    assert sorted((r['Tipo'], r['Comprimento (mm)']) for r in table.records()) == [('BANZO', 2500.0),
+                                                                                   ('MONTANTE', 700.0)]
+    assert stats['duplicadas'] == 2 and stats['fundidas'] == 1
+    assert 'linha 2' in capsys.readouterr().out
+
+def test_block_cleanup_remeasures_merged_run(tmp_path):
+    doc = ezdxf.new()
+    block = doc.blocks.new('TRELICA')
+    block.add_line((0, 0), (0, 500), dxfattribs={'layer': 'MONTANTE_Y'})
+    block.add_line((0, 0), (0, 500), dxfattribs={'layer': 'MONTANTE_Y'})  # duplicada: desloca as linhas seguintes
+    block.add_line((0, 0), (1000, 0), dxfattribs={'layer': 'BANZO_X'})
+    block.add_line((1000, 0), (2000, 0), dxfattribs={'layer': 'BANZO_X'})
+    doc.modelspace().add_blockref('TRELICA', (0, 0), dxfattribs={'xscale': 2})
+    path = str(tmp_path / 'bloco.dxf')
+    doc.saveas(path)
+    table = analyze_dxf_file(path, cleanup=True)
+    assert sorted((r['Tipo'], r['Comprimento (mm)']) for r in table.records()) == [('BANZO', 4000.0),
+                                                                                   ('MONTANTE', 500.0)]
@@ -0,0 +1,158 @@
+# tests/test_stock_cutting.py
+
+import math
+import random
+import time
+from collections import Counter
+from functools import lru_cache
+
+import pytest
+
+from src.stock_cutting import (DEFAULT_KERF, DEFAULT_STOCK_LENGTH, _martello_toth_bound, nest_stock_cutting,
+                               optimize_stock_cutting, stock_cutting_lower_bound)
+
+def original_greedy(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF):
+    """Guloso quadrático original (calculate_stock_cutting antes do nest_stock_cutting), como referência."""
+    if not lengths: return 0
+    pieces_to_cut = sorted(lengths, reverse=True)
+    bar_count = 1
+    current_bar_length = stock_length
+    while pieces_to_cut:
+        piece_cut_in_this_bar = False
+        for i, piece_length in enumerate(pieces_to_cut):
+            space_needed = piece_length
+            if current_bar_length < stock_length: space_needed += kerf
+            if current_bar_length >= space_needed:
+                if current_bar_length < stock_length: current_bar_length -= kerf
+                current_bar_length -= piece_length
+                pieces_to_cut.pop(i)
+                piece_cut_in_this_bar = True
+                break
+        if not piece_cut_in_this_bar and pieces_to_cut:
+            bar_count += 1
+            current_bar_length = stock_length
+    return bar_count
+
+def exact_bar_count(lengths, stock_length=DEFAULT_STOCK_LENGTH, kerf=DEFAULT_KERF):
+    """Ótimo por força bruta (poucas peças): menor número de barras que comporta todas."""
+    sizes = tuple(sorted((length + kerf for length in lengths), reverse=True))
+    capacity = stock_length + kerf
+
+    @lru_cache(maxsize=None)
+    def best(remaining):
+        if not remaining:
+            return 0
+        first, rest = remaining[0], remaining[1:]
+        result = 1 + best(rest)
+        # Barra que começa pela maior peça: tenta cada subconjunto do resto que cabe junto
+        def fill(index, free, chosen):
+            nonlocal result
+            if index == len(rest):
+                if chosen:
+                    left = tuple(size for i, size in enumerate(rest) if i not in chosen)
+                    result = min(result, 1 + best(left))
+                return
+            if rest[index] <= free + 1e-9:
+                fill(index + 1, free - rest[index], chosen | {index})
+            fill(index + 1, free, chosen)
+        fill(0, capacity - first, frozenset())
+        return result
+
+    return best(sizes)
+
+def random_lengths(rng, count, decimals):
+    return [round(rng.uniform(50, DEFAULT_STOCK_LENGTH), decimals) for _ in range(count)]
+
+def assert_valid_plan(plan, lengths):
+    """Cada barra cabe no comprimento da barra e o plano corta exatamente as peças pedidas."""
+    for bar in plan.bars:
+        assert plan.used_length(bar) <= plan.stock_length + 1e-6
+    cut = Counter()
+    for bar in plan.bars:
+        for length, qty in bar:
+            cut[round(length, 6)] += qty
+    for length in plan.oversized:
+        cut[round(length, 6)] += 1
+    assert cut == Counter(round(length, 6) for length in lengths)
+
+@pytest.mark.parametrize('chunk', range(10))
+def test_nest_matches_original_greedy(chunk):
+    # 3000 entradas aleatórias no total, em 10 blocos
+    for seed in range(chunk * 300, (chunk + 1) * 300):
+        rng = random.Random(seed)
+        lengths = random_lengths(rng, rng.randint(1, 120), rng.choice([0, 1, 3]))
+        # Repetições, como nas treliças reais
+        lengths += rng.choices(lengths, k=rng.randint(0, 60))
+        plan = nest_stock_cutting(lengths)
+        assert plan.bar_count == original_greedy(lengths), seed
+        assert_valid_plan(plan, lengths)
+
+def test_nest_exact_fits_and_oversized():
+    # 2998 + 4 + 2998 = 6000: duas peças exatamente numa barra
+    assert nest_stock_cutting([2998, 2998]).bar_count == 1
+    assert nest_stock_cutting([2999, 2998]).bar_count == 2
+    plan = nest_stock_cutting([6500, 1000])
+    assert plan.oversized == [6500]
+    assert plan.bar_count == 3  # 6500 mm ocupa 2 barras (emenda) + 1 para a peça de 1000
+    assert nest_stock_cutting([]).bar_count == 0
+
+@pytest.mark.parametrize('seed', range(60))
+def test_lower_bound_and_optimizer_against_exact(seed):
+    rng = random.Random(1000 + seed)
+    lengths = random_lengths(rng, rng.randint(1, 9), 0)
+    optimum = exact_bar_count(lengths)
+    assert stock_cutting_lower_bound(lengths) <= optimum
+    plan = optimize_stock_cutting(lengths, time_budget=1.0)
+    assert_valid_plan(plan, lengths)
+    assert plan.lower_bound <= optimum <= plan.bar_count <= nest_stock_cutting(lengths).bar_count
+    if plan.proven_optimal:
+        assert plan.bar_count == optimum
+        assert plan.gap == 0
+
+@pytest.mark.parametrize('seed', range(40))
+def test_optimizer_never_worse_than_greedy(seed):
+    rng = random.Random(2000 + seed)
+    lengths = random_lengths(rng, rng.randint(20, 300), rng.choice([0, 2]))
+    plan = optimize_stock_cutting(lengths, time_budget=0.2)
+    assert_valid_plan(plan, lengths)
+    assert plan.lower_bound <= plan.bar_count <= nest_stock_cutting(lengths).bar_count
+    assert plan.gap >= 0
+    assert not plan.proven_optimal or plan.gap == 0
+
+def test_optimizer_many_distinct_lengths():
+    # Mais comprimentos distintos que o limite de recursão do Python
+    lengths = [1000 + i * 0.37 for i in range(1200)]
+    plan = optimize_stock_cutting(lengths, time_budget=0.5)
+    assert_valid_plan(plan, lengths)
+    assert plan.bar_count <= nest_stock_cutting(lengths).bar_count
+
+def quadratic_martello_toth(sizes, counts, capacity, eps=1e-9):
+    """Limite L2 avaliado limiar a limiar varrendo todos os itens (versão O(d²) de referência)."""
+    items = [(size, qty) for size, qty in zip(sizes, counts) if qty]
+    half, best = capacity / 2, 0
+    for threshold in {0.0} | {size for size, _ in items if size <= half + eps}:
+        big = sum(qty for size, qty in items if size > capacity - threshold + eps)
+        medium = [(size, qty) for size, qty in items if half + eps < size <= capacity - threshold + eps]
+        small_total = sum(size * qty for size, qty in items if threshold - eps <= size <= half + eps)
+        medium_count = sum(qty for _, qty in medium)
+        medium_free = medium_count * capacity - sum(size * qty for size, qty in medium)
+        best = max(best, big + medium_count + max(0, math.ceil((small_total - medium_free) / capacity - eps)))
+    return best
+
+def test_martello_toth_matches_quadratic_reference():
+    rng = random.Random(7)
+    for _ in range(2000):
+        sizes = [rng.choice([rng.uniform(10, 6004), float(rng.randint(1, 60) * 100 + 4)])
+                 for _ in range(rng.randint(1, 40))]
+        counts = [rng.randint(0, 5) for _ in sizes]
+        assert _martello_toth_bound(sizes, counts, 6004) == quadratic_martello_toth(sizes, counts, 6004)
+
+def test_optimizer_respects_time_budget_with_distinct_lengths():
+    # Comprimentos reais são floats: quase todos distintos após o arredondamento
+    rng = random.Random(5)
+    lengths = [rng.uniform(50, DEFAULT_STOCK_LENGTH) for _ in range(10_000)]
+    budget = 1.0
+    start = time.perf_counter()
+    plan = optimize_stock_cutting(lengths, time_budget=budget)
+    assert time.perf_counter() - start < budget + 1.0
+    assert plan.lower_bound <= plan.bar_count <= nest_stock_cutting(lengths).bar_count